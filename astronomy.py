@@ -0,0 +1,226 @@
+"""
+Расчёт времён намазов по положению Солнца для произвольных координат.
+
+Использование:
+    python astronomy.py [год]
+
+Без аргументов сверяет расчёт для Симферополя с CSV расписанием
+(CSV остаётся основным источником) и печатает отклонения по каждому намазу.
+"""
+import math
+import sys
+from array import array
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional
+import pytz
+from config import TIMEZONE, PRAYER_KEYS, ASTRONOMY_CACHE_SIZE, COORD_PRECISION, LOCATION_COORDS
+from prayer_times import Timetable, MINUTES_PER_DAY, read_timetable_rows, timetable_paths
+
+# Угол Солнца на восходе/закате: радиус диска и рефракция
+RISE_SET_ANGLE = 0.833
+
+# Допустимое отклонение от CSV при сверке, мин
+VALIDATION_TOLERANCE = 3
+
+
+class PrayerMethod(NamedTuple):
+    """Параметры расчёта"""
+    fajr_angle: float                # Погружение Солнца под горизонт для фаджра, градусы
+    isha_angle: float                # То же для иши
+    asr_shadow: int                  # Длина тени для асра: 1 - шафиитский, 2 - ханафитский
+    adjustments: Dict[str, int]      # Поправки (ихтият) к каждому намазу, мин
+
+
+# Параметры, подобранные по расписанию ДУМК для Симферополя (python astronomy.py)
+DUMK_METHOD = PrayerMethod(
+    fajr_angle=16.1,
+    isha_angle=15.9,
+    asr_shadow=1,
+    adjustments={"fajr": 0, "sunrise": -11, "dhuhr": 4, "asr": -1, "maghrib": 10, "isha": 0},
+)
+
+
+def _sin(degrees: float) -> float:
+    return math.sin(math.radians(degrees))
+
+
+def _cos(degrees: float) -> float:
+    return math.cos(math.radians(degrees))
+
+
+def _tan(degrees: float) -> float:
+    return math.tan(math.radians(degrees))
+
+
+def sun_position(julian_day: float):
+    """Склонение Солнца (градусы) и уравнение времени (часы) на юлианскую дату"""
+    d = julian_day - 2451545.0
+    g = (357.529 + 0.98560028 * d) % 360
+    q = (280.459 + 0.98564736 * d) % 360
+    ecliptic_longitude = (q + 1.915 * _sin(g) + 0.020 * _sin(2 * g)) % 360
+    obliquity = 23.439 - 0.00000036 * d
+
+    right_ascension = math.degrees(math.atan2(
+        _cos(obliquity) * _sin(ecliptic_longitude), _cos(ecliptic_longitude)
+    )) / 15
+    declination = math.degrees(math.asin(_sin(obliquity) * _sin(ecliptic_longitude)))
+    equation_of_time = q / 15 - right_ascension % 24
+    # Приводим к диапазону [-12, 12)
+    equation_of_time = (equation_of_time + 12) % 24 - 12
+    return declination, equation_of_time
+
+
+def _hour_angle(latitude: float, declination: float, altitude: float) -> Optional[float]:
+    """Часовой угол (часы), при котором Солнце на высоте altitude; None - не достигает"""
+    cos_h = (_sin(altitude) - _sin(declination) * _sin(latitude)) / (_cos(declination) * _cos(latitude))
+    if not -1 <= cos_h <= 1:
+        return None
+    return math.degrees(math.acos(cos_h)) / 15
+
+
+def compute_day(
+    target_date: date,
+    latitude: float,
+    longitude: float,
+    utc_offset_hours: float,
+    method: PrayerMethod = DUMK_METHOD
+) -> Optional[List[int]]:
+    """
+    Времена намазов на дату (минуты от полуночи местного времени, порядок PRAYER_KEYS).
+    Если Солнце не опускается до угла фаджра/иши (высокие широты летом), они берутся
+    как доля ночи angle/60 от восхода/заката. None - нет восхода или заката (полярные день и ночь).
+    """
+    # Юлианская дата местного полудня
+    julian_day = target_date.toordinal() + 1721424.5 + 0.5 - longitude / 360
+    declination, equation_of_time = sun_position(julian_day)
+
+    # Истинный полдень в часах местного времени
+    noon = 12 - equation_of_time - longitude / 15 + utc_offset_hours
+
+    asr_altitude = math.degrees(math.atan(1 / (method.asr_shadow + _tan(abs(latitude - declination)))))
+    angles = {
+        "fajr": (-method.fajr_angle, -1),
+        "sunrise": (-RISE_SET_ANGLE, -1),
+        "asr": (asr_altitude, 1),
+        "maghrib": (-RISE_SET_ANGLE, 1),
+        "isha": (-method.isha_angle, 1),
+    }
+
+    sun_hour_angle = _hour_angle(latitude, declination, -RISE_SET_ANGLE)
+    if sun_hour_angle is None:
+        return None
+    night = 24 - 2 * sun_hour_angle
+    
+    minutes = []
+    for key in PRAYER_KEYS:
+        if key == "dhuhr":
+            hours = noon
+        else:
+            altitude, direction = angles[key]
+            hour_angle = _hour_angle(latitude, declination, altitude)
+            if hour_angle is None:
+                if key == "asr":
+                    return None
+                # Сумерки не кончаются всю ночь - доля ночи от восхода/заката
+                hour_angle = sun_hour_angle + night * -altitude / 60
+            hours = noon + direction * hour_angle
+        total = round(hours * 60) + method.adjustments.get(key, 0)
+        minutes.append(total % MINUTES_PER_DAY)
+    return minutes
+
+
+def compute_range(
+    start: date,
+    end: date,
+    latitude: float,
+    longitude: float,
+    tz_name: str = TIMEZONE,
+    method: PrayerMethod = DUMK_METHOD
+) -> Timetable:
+    """Таблица на даты от start до end включительно (дни без решения пропускаются)"""
+    tz = pytz.timezone(tz_name)
+    ordinals = array('I')
+    minutes = array('H')
+    day = start
+    while day <= end:
+        # Смещение пояса на полдень дня (учитывает переход на летнее время)
+        offset = tz.utcoffset(datetime(day.year, day.month, day.day, 12)).total_seconds() / 3600
+        row = compute_day(day, latitude, longitude, offset, method)
+        if row is not None:
+            ordinals.append(day.toordinal())
+            minutes.extend(row)
+        day += timedelta(days=1)
+    return Timetable(ordinals, minutes)
+
+
+def compute_year(
+    year: int,
+    latitude: float,
+    longitude: float,
+    tz_name: str = TIMEZONE,
+    method: PrayerMethod = DUMK_METHOD
+) -> Timetable:
+    """Таблица на весь год за один проход"""
+    return compute_range(date(year, 1, 1), date(year, 12, 31), latitude, longitude, tz_name, method)
+
+
+@lru_cache(maxsize=ASTRONOMY_CACHE_SIZE)
+def _cached_range(start: date, end: date, latitude: float, longitude: float, tz_name: str) -> Timetable:
+    return compute_range(start, end, latitude, longitude, tz_name)
+
+
+def coords_table(
+    start: date,
+    end: date,
+    latitude: float,
+    longitude: float,
+    tz_name: str = TIMEZONE
+) -> Timetable:
+    """
+    Таблица для координат только на запрошенные даты (день для расписания и напоминаний,
+    месяц для /month). Кэшируется по датам и округлённым координатам.
+    """
+    return _cached_range(start, end, round(latitude, COORD_PRECISION), round(longitude, COORD_PRECISION), tz_name)
+
+
+def validate(year: int = None) -> bool:
+    """Сверить расчёт для Симферополя с CSV, напечатать отклонения"""
+    rows, report = read_timetable_rows(timetable_paths())
+    if year is not None:
+        rows = {d: m for d, m in rows.items() if d.year == year}
+    if not rows:
+        print("❌ Нет данных CSV для сверки")
+        return False
+
+    latitude, longitude = LOCATION_COORDS["Акъмесджит (Симферополь)"]
+    tables = {}
+    deviations = {key: [] for key in PRAYER_KEYS}
+    for d, expected in sorted(rows.items()):
+        if d.year not in tables:
+            tables[d.year] = compute_year(d.year, latitude, longitude)
+        computed = tables[d.year].get_row(d)
+        if computed is None:
+            continue
+        for key, e, c in zip(PRAYER_KEYS, expected, computed):
+            diff = (c - e + MINUTES_PER_DAY // 2) % MINUTES_PER_DAY - MINUTES_PER_DAY // 2
+            deviations[key].append(diff)
+
+    ok = True
+    print(f"Сверка с CSV: {len(rows)} дней")
+    for key, diffs in deviations.items():
+        worst = max(diffs, key=abs)
+        mean = sum(diffs) / len(diffs)
+        status = "✅" if abs(worst) <= VALIDATION_TOLERANCE else "❌"
+        ok = ok and abs(worst) <= VALIDATION_TOLERANCE
+        print(f"{status} {key:8s} среднее {mean:+.2f} мин, максимум {worst:+d} мин")
+    return ok
+
+
+def main():
+    year = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    sys.exit(0 if validate(year) else 1)
+
+
+if __name__ == "__main__":
+    main()
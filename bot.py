@@ -3,12 +3,20 @@ import logging
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 
-from config import BOT_TOKEN
-from database import init_db
+from config import (
+    BOT_TOKEN, TELEGRAM_API_URL, WEBHOOK_URL, ROLE,
+    BROADCAST_RATE, BROADCAST_BURST, SCHEDULER_PROCESSES
+)
+from database import init_db, close_db, flush_pending_writes
 from handlers import setup_routers
 from scheduler import PrayerScheduler
+from broadcaster import Broadcaster
+from sharding import ShardLease
 from middlewares.i18n import I18nMiddleware
+from webhook import run_webhook
 
 # Настройка логирования
 logging.basicConfig(
@@ -22,9 +30,11 @@ async def main():
     # Инициализация БД
     await init_db()
     
-    # Создание бота
+    # Создание бота (при необходимости - со своим адресом Bot API)
+    session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)) if TELEGRAM_API_URL else None
     bot = Bot(
         token=BOT_TOKEN,
+        session=session,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
     
@@ -38,18 +48,46 @@ async def main():
     # Подключение роутеров
     dp.include_router(setup_routers())
     
-    # Запуск планировщика
-    scheduler = PrayerScheduler(bot)
-    scheduler.start()
+    # Запуск рассылки и планировщика (в роли bot рассылками занимаются другие процессы)
+    broadcaster = scheduler = lease = None
+    if ROLE == "scheduler":
+        # Лимит Telegram общий на бота - делим его между процессами-планировщиками
+        lease = ShardLease()
+        broadcaster = Broadcaster(
+            bot,
+            rate=BROADCAST_RATE / SCHEDULER_PROCESSES,
+            burst=max(1, BROADCAST_BURST / SCHEDULER_PROCESSES),
+            lease=lease
+        )
+    elif ROLE != "bot":
+        broadcaster = Broadcaster(bot)
+    if broadcaster:
+        broadcaster.start()
+        scheduler = PrayerScheduler(bot, broadcaster, lease)
+        scheduler.start()
     
-    logger.info("Бот запущен")
+    logger.info(f"Бот запущен (роль: {ROLE})")
     
     try:
-        # Удаление webhook и запуск polling
-        await bot.delete_webhook(drop_pending_updates=True)
-        await dp.start_polling(bot, polling_timeout=60)
+        if ROLE == "scheduler":
+            # Обновления принимает процесс с ролью bot
+            await asyncio.Event().wait()
+        elif WEBHOOK_URL:
+            await run_webhook(bot, dp)
+        else:
+            # Удаление webhook и запуск polling
+            await bot.delete_webhook(drop_pending_updates=True)
+            await dp.start_polling(bot, polling_timeout=60)
     finally:
-        scheduler.stop()
+        if scheduler:
+            scheduler.stop()
+            await broadcaster.stop()
+        # Сначала журнал отправок: пока аренда жива, другой процесс не заберёт
+        # уже отправленные, но ещё не отмеченные 'sent' сообщения и не продублирует их
+        await flush_pending_writes()
+        if lease:
+            await lease.release()
+        await close_db()
         await bot.session.close()
 
 
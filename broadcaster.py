@@ -1,15 +1,71 @@
 import asyncio
+import itertools
 import logging
+import time
+from collections import deque
+from typing import Dict, List, Optional, Set
 from aiogram import Bot
 from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest
-from database import set_chat_active_status
+from database import queue_chat_active_status, delivery_journal, DeliveryKey, PROCESS_OWNER
+from sharding import ShardLease
+from config import (
+    BROADCAST_RATE, BROADCAST_BURST, BROADCAST_CHAT_INTERVAL,
+    BROADCAST_GROUP_INTERVAL, BROADCAST_WORKERS, BROADCAST_QUEUE_SIZE, LATENCY_SAMPLES,
+    BROADCAST_MAX_RETRIES
+)
 
 logger = logging.getLogger(__name__)
 
-async def send_safe_message(bot: Bot, chat_id: int, text: str, disable_notification: bool = False) -> bool:
+class FloodGate:
     """
-    Безопасная отправка сообщения.
-    Возвращает True, если отправлено успешно, иначе False.
+    Общий "шлагбаум" для всех исходящих сообщений.
+    Один TelegramRetryAfter приостанавливает всю отправку на retry_after секунд,
+    вместо того чтобы каждая задача ловила свой flood wait.
+    """
+
+    def __init__(self):
+        self._open = asyncio.Event()
+        self._open.set()
+        self._resume_at = 0.0
+        self._reopen_task: Optional[asyncio.Task] = None
+        self.pauses = 0
+        self.paused_seconds = 0.0
+
+    @property
+    def is_open(self) -> bool:
+        return self._open.is_set()
+
+    async def wait(self):
+        """Дождаться, пока отправка снова разрешена"""
+        await self._open.wait()
+
+    def pause(self, seconds: float):
+        """Приостановить отправку минимум на seconds секунд"""
+        resume_at = time.monotonic() + seconds
+        if resume_at <= self._resume_at:
+            return
+        self._resume_at = resume_at
+        self.pauses += 1
+        self._open.clear()
+        if self._reopen_task is None or self._reopen_task.done():
+            self._reopen_task = asyncio.create_task(self._reopen())
+
+    async def _reopen(self):
+        started = time.monotonic()
+        while (delay := self._resume_at - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+        self.paused_seconds += time.monotonic() - started
+        self._open.set()
+
+
+# Глобальный экземпляр
+flood_gate = FloodGate()
+
+
+async def _deliver(bot: Bot, chat_id: int, text: str, disable_notification: bool = False) -> bool:
+    """
+    Одна попытка отправки.
+    TelegramRetryAfter пробрасывается наверх, остальные ошибки обрабатываются здесь.
     """
     try:
         await bot.send_message(
@@ -20,16 +76,14 @@ async def send_safe_message(bot: Bot, chat_id: int, text: str, disable_notificat
         )
         return True
         
-    except TelegramRetryAfter as e:
-        # Если Telegram говорит "подожди", мы ждем и пробуем снова
-        logger.warning(f"Flood limit exceeded for {chat_id}. Sleep {e.retry_after} seconds.")
-        await asyncio.sleep(e.retry_after)
-        return await send_safe_message(bot, chat_id, text, disable_notification)
+    except TelegramRetryAfter:
+        raise
         
     except TelegramForbiddenError:
         # Пользователь заблокировал бота
         logger.info(f"Chat {chat_id} blocked the bot. Deactivating.")
-        await set_chat_active_status(chat_id, False)
+        # Пишем отложенно, чтобы не упираться в commit посреди рассылки
+        queue_chat_active_status(chat_id, False)
         
     except TelegramBadRequest as e:
         logger.error(f"Bad request for {chat_id}: {e}")
@@ -37,4 +91,244 @@ async def send_safe_message(bot: Bot, chat_id: int, text: str, disable_notificat
     except Exception as e:
         logger.error(f"Unexpected error for {chat_id}: {e}")
         
-    return False
\ No newline at end of file
+    return False
+
+
+class TokenBucket:
+    """Глобальный лимит скорости: rate токенов в секунду, не более capacity подряд"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Дождаться и забрать один токен"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class LatencyStats:
+    """Задержки отправки относительно срока (последние maxlen значений)"""
+
+    def __init__(self, maxlen: int = LATENCY_SAMPLES):
+        self.samples: deque = deque(maxlen=maxlen)
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> float:
+        """Перцентиль p (0-100), сек"""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def summary(self) -> str:
+        if not self.samples:
+            return "нет данных"
+        return f"p50 {self.percentile(50):.2f} сек, p99 {self.percentile(99):.2f} сек"
+
+
+class Broadcaster:
+    """
+    Движок рассылки: очередь сообщений и пул воркеров.
+    Соблюдает глобальный лимит Telegram (token bucket) и лимит на один чат.
+    При flood wait вся рассылка встаёт на паузу (FloodGate), а сообщение
+    возвращается в очередь с ограниченным числом повторов.
+    Сообщения со сроком (напоминания) идут вне очереди, по возрастанию срока:
+    ежедневная рассылка тысяч расписаний не задерживает их.
+    Сообщения с ключом журнала отправок не дублируются, пока они в очереди,
+    а итог отправки записывается в журнал.
+    С арендой шардов сообщения чатов, которые процесс уже не арендует, не отправляются:
+    их разошлёт новый владелец шарда.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        rate: float = BROADCAST_RATE,
+        burst: float = BROADCAST_BURST,
+        workers: int = BROADCAST_WORKERS,
+        queue_size: int = BROADCAST_QUEUE_SIZE,
+        lease: Optional[ShardLease] = None
+    ):
+        self.bot = bot
+        self.lease = lease
+        # От чьего имени заняты отправки в журнале
+        self.owner = lease.owner if lease else PROCESS_OWNER
+        self.bucket = TokenBucket(rate, burst)
+        # Элементы - (срочность, срок, номер, сообщение): сначала сообщения со сроком
+        # в порядке срока, затем остальные в порядке постановки
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue(maxsize=queue_size)
+        self._seq = itertools.count()
+        self.workers_count = workers
+        self._workers: List[asyncio.Task] = []
+        # Момент (monotonic), раньше которого нельзя писать в чат
+        self._chat_next_send: Dict[int, float] = {}
+        self.gate = flood_gate
+        # Ключи журнала сообщений, которые сейчас в очереди или отправляются
+        self._inflight_keys: Set[DeliveryKey] = set()
+        # Повторы, ждущие места в переполненной очереди
+        self._requeue_tasks: Set[asyncio.Task] = set()
+        # Задержка от срока до фактической отправки (для сообщений со сроком)
+        self.latency = LatencyStats()
+        self.duplicates = 0
+        self.foreign = 0
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+
+    def start(self):
+        """Запуск воркеров"""
+        for _ in range(self.workers_count):
+            self._workers.append(asyncio.create_task(self._worker()))
+        logger.info(f"Рассылка запущена: {self.workers_count} воркеров")
+
+    async def stop(self, timeout: Optional[float] = 10):
+        """Дождаться отправки очереди (не дольше timeout) и остановить воркеров"""
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Рассылка остановлена, в очереди осталось {self.queue.qsize()} сообщений")
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+        logger.info(f"Рассылка остановлена: {self.stats()}")
+
+    def stats(self) -> str:
+        """Счётчики рассылки и задержка от срока (p50/p99) одной строкой"""
+        return (
+            f"в очереди {self.queue.qsize()}, отправлено {self.sent}, ошибок {self.failed}, "
+            f"повторов {self.retries}, дублей отброшено {self.duplicates}, чужих шардов {self.foreign}, "
+            f"пауз {self.gate.pauses} ({self.gate.paused_seconds:.1f} сек), "
+            f"задержка от срока: {self.latency.summary()}"
+        )
+
+    def _entry(self, job: tuple) -> tuple:
+        """Элемент очереди с приоритетом: сообщения со сроком - первыми"""
+        due = job[5]
+        if due is None:
+            return (1, 0.0, next(self._seq), job)
+        return (0, due, next(self._seq), job)
+
+    async def submit(
+        self,
+        chat_id: int,
+        text: str,
+        disable_notification: bool = False,
+        key: Optional[DeliveryKey] = None,
+        due: Optional[float] = None
+    ) -> bool:
+        """
+        Поставить сообщение в очередь рассылки (False - такое уже в очереди).
+        due - срок отправки по часам цикла событий (loop.time()), для статистики задержек.
+        """
+        if key is not None:
+            if key in self._inflight_keys:
+                self.duplicates += 1
+                return False
+            self._inflight_keys.add(key)
+        await self.queue.put(self._entry((chat_id, text, disable_notification, 0, key, due)))
+        return True
+
+    def _finish(self, key: Optional[DeliveryKey], sent: bool):
+        """Записать итог отправки в журнал"""
+        if key is None:
+            return
+        self._inflight_keys.discard(key)
+        delivery_journal.mark(key, 'sent' if sent else 'failed', self.owner)
+
+    def _drop_foreign(self, chat_id: int, key: Optional[DeliveryKey]) -> bool:
+        """
+        Отбросить сообщение, если чат больше не в своих шардах (шард отдан или аренда истекла).
+        Запись журнала остаётся 'pending': её заберёт новый владелец.
+        """
+        if self.lease is None or self.lease.owns(chat_id):
+            return False
+        self.foreign += 1
+        if key is not None:
+            self._inflight_keys.discard(key)
+        return True
+
+    def _requeue(self, job: tuple):
+        """Вернуть сообщение в очередь после flood wait"""
+        entry = self._entry(job)
+        try:
+            self.queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            task = asyncio.create_task(self.queue.put(entry))
+            self._requeue_tasks.add(task)
+            task.add_done_callback(self._requeue_tasks.discard)
+
+    async def _wait_chat_slot(self, chat_id: int):
+        """Соблюдение лимита на один чат"""
+        now = time.monotonic()
+        interval = BROADCAST_GROUP_INTERVAL if chat_id < 0 else BROADCAST_CHAT_INTERVAL
+        next_send = self._chat_next_send.get(chat_id, 0)
+        self._chat_next_send[chat_id] = max(now, next_send) + interval
+        
+        if len(self._chat_next_send) > self.queue.maxsize:
+            # Убираем устаревшие записи, чтобы словарь не рос бесконечно
+            self._chat_next_send = {
+                cid: t for cid, t in self._chat_next_send.items() if t > now
+            }
+        
+        if next_send > now:
+            await asyncio.sleep(next_send - now)
+
+    async def _worker(self):
+        while True:
+            *_, job = await self.queue.get()
+            chat_id, text, disable_notification, attempt, key, due = job
+            try:
+                if self._drop_foreign(chat_id, key):
+                    continue
+                await self.gate.wait()
+                await self._wait_chat_slot(chat_id)
+                await self.bucket.acquire()
+                # Пока ждали лимитов, кто-то мог получить flood wait, а шард - уйти другому процессу
+                await self.gate.wait()
+                if self._drop_foreign(chat_id, key):
+                    continue
+                if await _deliver(self.bot, chat_id, text, disable_notification):
+                    self.sent += 1
+                    self._finish(key, True)
+                    if due is not None:
+                        self.latency.add(asyncio.get_running_loop().time() - due)
+                else:
+                    self.failed += 1
+                    self._finish(key, False)
+            except TelegramRetryAfter as e:
+                logger.warning(f"Flood limit exceeded for {chat_id}. Pause {e.retry_after} seconds.")
+                self.gate.pause(e.retry_after)
+                if attempt < BROADCAST_MAX_RETRIES:
+                    self.retries += 1
+                    # Ключ остаётся занятым: повтор - это то же сообщение
+                    self._requeue((chat_id, text, disable_notification, attempt + 1, key, due))
+                else:
+                    self.failed += 1
+                    self._finish(key, False)
+                    logger.error(f"Message to {chat_id} dropped after {attempt} retries")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                self._finish(key, False)
+                logger.error(f"Broadcast worker error for {chat_id}: {e}")
+            finally:
+                self.queue.task_done()
@@ -0,0 +1,39 @@
+"""
+Компиляция CSV расписаний в бинарный файл для быстрого запуска.
+
+Использование:
+    python compile_timetable.py [путь_к_bin]
+
+Читает data/prayer_times*.csv (с той же проверкой, что и бот) и пишет
+TIMETABLE_BIN_PATH. Бот открывает его через mmap, если хэш CSV в заголовке
+совпадает с текущими файлами.
+"""
+import sys
+from config import TIMETABLE_BIN_PATH
+from prayer_times import Timetable, read_timetable_rows, sources_digest, timetable_paths
+
+
+def main():
+    out_path = sys.argv[1] if len(sys.argv) > 1 else TIMETABLE_BIN_PATH
+    
+    paths = timetable_paths()
+    rows, report = read_timetable_rows(paths)
+    for error in report.errors:
+        print(f"⚠️ {error}")
+    
+    if not rows:
+        print("❌ Нет корректных строк, файл не записан")
+        sys.exit(1)
+    
+    Timetable.from_rows(rows).to_file(out_path, sources_digest(paths))
+    
+    # Проверяем, что файл читается и совпадает с CSV
+    compiled = Timetable.from_file(out_path)
+    for d, minutes in rows.items():
+        assert compiled.get_row(d) == tuple(minutes), d
+    
+    print(f"✅ {out_path}: {report.loaded} дней из {len(report.files)} файлов, отброшено строк: {report.rejected}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,26 @@ load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 ADMIN_ID = [int(x) for x in os.getenv("ADMIN_ID").split(",")]
 
+# Свой адрес Bot API (локальный сервер или тестовая заглушка), по умолчанию api.telegram.org
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+
+# Webhook: если задан WEBHOOK_URL, бот принимает обновления через aiohttp вместо polling
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")              # Внешний адрес, например https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")        # Сверяется с X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+UPDATE_QUEUE_SIZE = 10000   # Максимум необработанных обновлений, дальше webhook отвечает 503
+UPDATE_WORKERS = 32         # Сколько обновлений обрабатывается одновременно
+
+# Роль процесса: all - всё в одном процессе, bot - только обработка обновлений,
+# scheduler - только рассылки по арендованным шардам (запуск нескольких: python launcher.py)
+ROLE = os.getenv("ROLE", "all")
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "16"))                  # Чат принадлежит шарду abs(chat_id) % SHARD_COUNT
+SCHEDULER_PROCESSES = int(os.getenv("SCHEDULER_PROCESSES", "1"))   # Между ними делится лимит рассылки
+SHARD_LEASE_TTL = 30        # Аренда шарда без продления истекает через, сек
+SHARD_RENEW_INTERVAL = 10   # Как часто продлевать аренду, сек
+
 # Timezone
 TIMEZONE = "Europe/Simferopol"
 
@@ -100,9 +120,56 @@ RAMADAN_PERIODS = {
 # Путь к CSV файлу
 CSV_PATH = "data/prayer_times.csv"
 
+# Все файлы расписания (по одному на год): data/prayer_times.csv, data/prayer_times_2027.csv, ...
+TIMETABLE_GLOB = "data/prayer_times*.csv"
+
+# Скомпилированное расписание (python compile_timetable.py), читается через mmap
+TIMETABLE_BIN_PATH = "data/prayer_times.bin"
+
+# Начала месяцев хиджры по календарю ДУМК
+HIJRI_CALENDAR_PATH = "data/hijri_calendar.csv"
+
+# Кэш готовых текстов расписания (по профилю форматирования и дате)
+RENDER_CACHE_SIZE = 5000
+
+# Астрономический расчёт (astronomy.py): считаются только нужные дни (день, месяц),
+# таблицы кэшируются по датам и координатам, округлённым до COORD_PRECISION знаков (0.01° ≈ 1 км)
+ASTRONOMY_CACHE_SIZE = 4096
+COORD_PRECISION = 2
+
 # База данных
 DATABASE_PATH = "data/prayer_bot.db"
 
+# Кэш настроек чатов в памяти
+SETTINGS_CACHE_SIZE = 10000    # Максимум чатов в кэше (LRU)
+SETTINGS_CACHE_TTL = 300       # Время жизни записи, сек
+
+# Отложенная запись (write-behind) статусов и настроек
+WRITE_BEHIND_INTERVAL = 0.5    # Максимальная задержка записи, сек
+WRITE_BEHIND_MAX_ITEMS = 500   # Запись сразу, если накопилось столько чатов
+
+# Рассылка
+BROADCAST_RATE = 25            # Глобальный лимит, сообщений в секунду
+BROADCAST_BURST = 25           # Размер "всплеска" для token bucket
+BROADCAST_CHAT_INTERVAL = 1.0  # Минимальный интервал между сообщениями в один чат (сек)
+BROADCAST_GROUP_INTERVAL = 3.0 # То же для групп (не более 20 сообщений в минуту)
+BROADCAST_WORKERS = 16         # Количество одновременных отправок
+BROADCAST_QUEUE_SIZE = 50000   # Максимальный размер очереди рассылки
+BROADCAST_MAX_RETRIES = 3      # Сколько раз повторять сообщение после flood wait
+
+# Журнал запланированных отправок (защита от пропусков и дублей при перезапуске)
+DELIVERY_GRACE_MINUTES = 15    # После запуска досылаем пропущенное не старше стольких минут
+DELIVERY_JOURNAL_DAYS = 2      # Сколько дней хранить записи журнала
+CATCH_UP_MAX_MINUTES = 15      # Опоздавший тик досылает пропущенные минуты, но не больше стольких
+
+# Точное время напоминаний: за минуту до срока они ставятся на колесо таймеров (timer_wheel.py)
+TIMER_WHEEL_TICK = 0.05        # Точность срабатывания, сек
+TIMER_WHEEL_SLOTS = 64         # Слотов на уровне
+TIMER_WHEEL_LEVELS = 4         # Уровней (0.05 * 64^4 сек ≈ 9.7 суток)
+REMINDER_SPREAD = 5.0          # Напоминания одной минуты разносятся по чатам на столько секунд
+LATENCY_SAMPLES = 10000        # Сколько последних задержек отправки хранить для p50/p99
+STATS_LOG_INTERVAL = 300       # Как часто писать в лог статистику рассылки (очередь, p50/p99), сек
+
 # Список городов с смещениями
 LOCATIONS = [
     ("Акъмесджит (Симферополь)", 0),
@@ -121,4 +188,30 @@ LOCATIONS = [
     ("Судакъ (Судак)", -3),
     ("Акъшейх (Раздольное)", 3),
     ("Акъмечит (Черноморское)", 4),
-]
\ No newline at end of file
+]
+# Геопозиция: город подбирается, только если до него не дальше этого расстояния, км
+MAX_CITY_DISTANCE_KM = 60
+# Дальше от городов времена считаются по координатам, но только в пределах региона
+# (мин. широта, макс. широта, мин. долгота, макс. долгота): расчёт ведётся по часам TIMEZONE
+# и с поправками, подобранными для Крыма, и за пределами региона давал бы неверное время
+COORDS_REGION = (44.2, 46.4, 32.3, 36.8)
+
+# Координаты городов (широта, долгота)
+LOCATION_COORDS = {
+    "Акъмесджит (Симферополь)": (44.952, 34.102),
+    "Алушта": (44.676, 34.410),
+    "Багъчасарай": (44.752, 33.861),
+    "Къарасувбазар (Белогорск)": (45.057, 34.602),
+    "Джанкой": (45.709, 34.393),
+    "Кезлев (Евпатория)": (45.190, 33.367),
+    "Сакъ (Саки)": (45.134, 33.600),
+    "Керич (Керчь)": (45.357, 36.468),
+    "Ор Къапы (Перекоп)": (46.155, 33.690),
+    "Акъяр (Севастополь)": (44.617, 33.525),
+    "Эски Къырым (Старый Крым)": (45.029, 35.089),
+    "Кефе (Феодосия)": (45.032, 35.382),
+    "Ялта": (44.495, 34.166),
+    "Судакъ (Судак)": (44.851, 34.975),
+    "Акъшейх (Раздольное)": (45.770, 33.493),
+    "Акъмечит (Черноморское)": (45.507, 32.698),
+}
@@ -1,213 +1,813 @@
 import aiosqlite
+import asyncio
 import json
-from config import DATABASE_PATH, PRAYER_KEYS
-from typing import Optional, Dict, Any
+import logging
+import os
+import socket
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from config import (
+    DATABASE_PATH, PRAYER_KEYS, SETTINGS_CACHE_SIZE, SETTINGS_CACHE_TTL,
+    WRITE_BEHIND_INTERVAL, WRITE_BEHIND_MAX_ITEMS, SHARD_COUNT
+)
+from typing import Optional, Dict, Any, Callable, List, Iterable, Tuple, Set
+
+logger = logging.getLogger(__name__)
+
+# Настройки SQLite для долгоживущего соединения
+DATABASE_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -8000",
+    "PRAGMA temp_store = MEMORY",
+]
+
+# Идентификатор процесса: владелец аренды шардов и записей журнала отправок
+PROCESS_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+# Общее соединение с БД (создаётся в init_db / при первом обращении)
+_db: Optional[aiosqlite.Connection] = None
+_db_lock = asyncio.Lock()
+# Записи сериализуются, чтобы commit одной операции не захватывал чужие изменения
+_write_lock = asyncio.Lock()
+
+# Колонки, которые можно менять через save_chat_settings
+SETTINGS_COLUMNS = {
+    'is_active', 'daily_schedule_time', 'schedule_day', 'time_offset',
+    'prayer_offsets', 'reminders', 'enabled_prayers', 'location_name',
+    'show_location', 'prayer_names_style', 'hijri_style', 'show_hijri',
+    'show_holidays', 'language', 'latitude', 'longitude',
+}
+# Колонки, которые хранятся как JSON
+JSON_COLUMNS = {'prayer_offsets', 'reminders', 'enabled_prayers'}
+
+# Кэш настроек: chat_id -> (момент загрузки, настройки или None если чата нет)
+_settings_cache: "OrderedDict[int, Tuple[float, Optional[Dict[str, Any]]]]" = OrderedDict()
+# Счётчик инвалидаций: чтение, начатое до записи, не должно попасть в кэш
+_settings_cache_generation = 0
+
+# Подписчики на изменение настроек чата: listener(chat_id, изменённые поля)
+_settings_listeners: List[Callable[[int, Iterable[str]], None]] = []
+
+
+def add_settings_listener(listener: Callable[[int, Iterable[str]], None]):
+    """Подписаться на изменения настроек чатов"""
+    _settings_listeners.append(listener)
+
+
+def _copy_settings(settings: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Копия настроек, чтобы изменения в хендлерах не портили кэш"""
+    if settings is None:
+        return None
+    result = dict(settings)
+    result['prayer_offsets'] = dict(settings['prayer_offsets'])
+    result['reminders'] = dict(settings['reminders'])
+    result['enabled_prayers'] = list(settings['enabled_prayers'])
+    return result
+
+
+def _cache_settings(chat_id: int, settings: Optional[Dict[str, Any]]):
+    """Положить настройки в кэш с вытеснением самых старых записей"""
+    _settings_cache[chat_id] = (time.monotonic(), settings)
+    _settings_cache.move_to_end(chat_id)
+    while len(_settings_cache) > SETTINGS_CACHE_SIZE:
+        _settings_cache.popitem(last=False)
+
+
+def invalidate_settings_cache(chat_id: Optional[int] = None):
+    """Сбросить кэш настроек чата (или весь кэш)"""
+    global _settings_cache_generation
+    _settings_cache_generation += 1
+    if chat_id is None:
+        _settings_cache.clear()
+    else:
+        _settings_cache.pop(chat_id, None)
+
+
+def _notify_settings_changed(chat_id: int, fields: Iterable[str]):
+    """Оповестить подписчиков об изменении настроек чата"""
+    fields = tuple(fields)
+    for listener in _settings_listeners:
+        listener(chat_id, fields)
+
+
+async def get_db() -> aiosqlite.Connection:
+    """Получить общее соединение с БД (открывается один раз)"""
+    global _db
+    if _db is None:
+        async with _db_lock:
+            if _db is None:
+                db = await aiosqlite.connect(DATABASE_PATH)
+                db.row_factory = aiosqlite.Row
+                for pragma in DATABASE_PRAGMAS:
+                    await db.execute(pragma)
+                _db = db
+                logger.info("Соединение с БД открыто")
+    return _db
+
+
+async def close_db():
+    """Закрыть общее соединение с БД"""
+    global _db
+    if _db is not None:
+        db, _db = _db, None
+        await db.close()
+        logger.info("Соединение с БД закрыто")
+
+
+async def backup_database(target_path: str):
+    """
+    Согласованная копия базы в target_path.
+    В режиме WAL свежие записи лежат в -wal до checkpoint, поэтому сам файл БД неполон.
+    """
+    # Отложенные настройки тоже должны попасть в копию
+    await write_buffer.flush()
+    db = await get_db()
+    async with aiosqlite.connect(target_path) as target:
+        async with _write_lock:
+            await db.backup(target)
+
 
 async def init_db():
     """Инициализация базы данных"""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        # Таблица настроек чатов
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS chat_settings (
-                chat_id INTEGER PRIMARY KEY,
-                chat_type TEXT DEFAULT 'private',
-                is_active INTEGER DEFAULT 1,
+    db = await get_db()
+    # Таблица настроек чатов
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS chat_settings (
+            chat_id INTEGER PRIMARY KEY,
+            chat_type TEXT DEFAULT 'private',
+            is_active INTEGER DEFAULT 1,
                 
-                -- Время ежедневной отправки расписания (NULL = не отправлять)
-                daily_schedule_time TEXT DEFAULT NULL,
+            -- Время ежедневной отправки расписания (NULL = не отправлять)
+            daily_schedule_time TEXT DEFAULT NULL,
                 
-                -- Какой день показывать: 'today' или 'tomorrow'
-                schedule_day TEXT DEFAULT 'today',
+            -- Какой день показывать: 'today' или 'tomorrow'
+            schedule_day TEXT DEFAULT 'today',
                 
-                -- Общее смещение времени в минутах
-                time_offset INTEGER DEFAULT 0,
+            -- Общее смещение времени в минутах
+            time_offset INTEGER DEFAULT 0,
                 
-                -- Индивидуальные смещения для каждого намаза (JSON)
-                prayer_offsets TEXT DEFAULT '{}',
+            -- Индивидуальные смещения для каждого намаза (JSON)
+            prayer_offsets TEXT DEFAULT '{}',
                 
-                -- Напоминания за N минут (JSON)
-                reminders TEXT DEFAULT '{}',
+            -- Напоминания за N минут (JSON)
+            reminders TEXT DEFAULT '{}',
                 
-                -- Включенные намазы (JSON массив)
-                enabled_prayers TEXT DEFAULT '["fajr","sunrise","dhuhr","asr","maghrib","isha"]',
+            -- Включенные намазы (JSON массив)
+            enabled_prayers TEXT DEFAULT '["fajr","sunrise","dhuhr","asr","maghrib","isha"]',
                 
-                -- Название локации
-                location_name TEXT DEFAULT 'Симферополь',
+            -- Название локации
+            location_name TEXT DEFAULT 'Симферополь',
                 
-                -- Показывать ли локацию в расписании
-                show_location INTEGER DEFAULT 1,
+            -- Показывать ли локацию в расписании
+            show_location INTEGER DEFAULT 1,
                 
-                -- Стиль названий намазов: standard, crimean_cyrillic, crimean_latin
-                prayer_names_style TEXT DEFAULT 'standard',
+            -- Координаты своей локации (NULL - расписание CSV со смещением)
+            latitude REAL DEFAULT NULL,
+            longitude REAL DEFAULT NULL,
                 
-                -- Стиль хиджри месяцев: translit, arabic
-                hijri_style TEXT DEFAULT 'translit',
+            -- Стиль названий намазов: standard, crimean_cyrillic, crimean_latin
+            prayer_names_style TEXT DEFAULT 'standard',
                 
-                -- Показывать ли дату хиджри
-                show_hijri INTEGER DEFAULT 1,
+            -- Стиль хиджри месяцев: translit, arabic
+            hijri_style TEXT DEFAULT 'translit',
                 
-                -- Показывать ли праздники
-                show_holidays INTEGER DEFAULT 1,
+            -- Показывать ли дату хиджри
+            show_hijri INTEGER DEFAULT 1,
                 
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+            -- Показывать ли праздники
+            show_holidays INTEGER DEFAULT 1,
+                
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
 
-        await db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_daily_schedule_time 
-            ON chat_settings(daily_schedule_time) 
-            WHERE is_active = 1 AND daily_schedule_time IS NOT NULL
-        """)
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_daily_schedule_time 
+        ON chat_settings(daily_schedule_time) 
+        WHERE is_active = 1 AND daily_schedule_time IS NOT NULL
+    """)
+    
+    # По нему процессы-планировщики находят чаты, изменённые другими процессами
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_updated_at ON chat_settings(updated_at)
+    """)
+    
+    # Шардированный режим: аренда шардов процессами-планировщиками
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS shard_leases (
+            shard_id INTEGER PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    """)
+    # Журнал запланированных отправок: (чат, вид, момент по расписанию) -> статус.
+    # target - местное время "YYYY-MM-DDTHH:MM", kind - "daily" или "reminder_<намаз>",
+    # owner - процесс, занявший отправку (у 'pending' updated_at - время, когда её заняли)
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS delivery_journal (
+            chat_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            target TEXT NOT NULL,
+            status TEXT NOT NULL,
+            owner TEXT,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (chat_id, kind, target)
+        ) WITHOUT ROWID
+    """)
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_delivery_journal_target ON delivery_journal(target)
+    """)
+    
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS shard_workers (
+            owner TEXT PRIMARY KEY,
+            expires_at REAL NOT NULL
+        )
+    """)
         
-        # Миграция: добавление новых колонок если их нет
-        try:
-            await db.execute("ALTER TABLE chat_settings ADD COLUMN show_location INTEGER DEFAULT 1")
-        except:
-            pass
-        try:
-            await db.execute("ALTER TABLE chat_settings ADD COLUMN prayer_names_style TEXT DEFAULT 'standard'")
-        except:
-            pass
-        try:
-            await db.execute("ALTER TABLE chat_settings ADD COLUMN hijri_style TEXT DEFAULT 'translit'")
-        except:
-            pass
-        try:
-            await db.execute("ALTER TABLE chat_settings ADD COLUMN show_hijri INTEGER DEFAULT 1")
-        except:
-            pass
-        try:
-            await db.execute("ALTER TABLE chat_settings ADD COLUMN show_holidays INTEGER DEFAULT 1")
-        except:
-            pass
-        try:
-            await db.execute("ALTER TABLE chat_settings ADD COLUMN language TEXT DEFAULT 'ru'")
-        except:
-            pass
+    # Миграция: добавление новых колонок если их нет
+    try:
+        await db.execute("ALTER TABLE chat_settings ADD COLUMN show_location INTEGER DEFAULT 1")
+    except:
+        pass
+    try:
+        await db.execute("ALTER TABLE chat_settings ADD COLUMN prayer_names_style TEXT DEFAULT 'standard'")
+    except:
+        pass
+    try:
+        await db.execute("ALTER TABLE chat_settings ADD COLUMN hijri_style TEXT DEFAULT 'translit'")
+    except:
+        pass
+    try:
+        await db.execute("ALTER TABLE chat_settings ADD COLUMN show_hijri INTEGER DEFAULT 1")
+    except:
+        pass
+    try:
+        await db.execute("ALTER TABLE chat_settings ADD COLUMN show_holidays INTEGER DEFAULT 1")
+    except:
+        pass
+    try:
+        await db.execute("ALTER TABLE chat_settings ADD COLUMN language TEXT DEFAULT 'ru'")
+    except:
+        pass
+    try:
+        await db.execute("ALTER TABLE delivery_journal ADD COLUMN owner TEXT")
+    except:
+        pass
+    try:
+        await db.execute("ALTER TABLE chat_settings ADD COLUMN latitude REAL DEFAULT NULL")
+        await db.execute("ALTER TABLE chat_settings ADD COLUMN longitude REAL DEFAULT NULL")
+    except:
+        pass
         
-        await db.commit()
+    await db.commit()
+
+
+def _row_to_settings(row) -> Dict[str, Any]:
+    """Преобразовать строку БД в словарь настроек (с разбором JSON полей)"""
+    settings = dict(row)
+    settings['prayer_offsets'] = json.loads(settings.get('prayer_offsets') or '{}')
+    settings['reminders'] = json.loads(settings.get('reminders') or '{}')
+    settings['enabled_prayers'] = json.loads(settings.get('enabled_prayers') or '[]')
+    return settings
 
 
 async def get_chat_settings(chat_id: int) -> Optional[Dict[str, Any]]:
-    """Получить настройки чата"""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute(
-            "SELECT * FROM chat_settings WHERE chat_id = ?", (chat_id,)
-        ) as cursor:
-            row = await cursor.fetchone()
-            if row:
-                settings = dict(row)
-                settings['prayer_offsets'] = json.loads(settings.get('prayer_offsets') or '{}')
-                settings['reminders'] = json.loads(settings.get('reminders') or '{}')
-                settings['enabled_prayers'] = json.loads(settings.get('enabled_prayers') or '[]')
-                # Установка значений по умолчанию для новых полей
-                settings.setdefault('show_location', 1)
-                settings.setdefault('prayer_names_style', 'standard')
-                settings.setdefault('hijri_style', 'cyrillic')
-                settings.setdefault('show_hijri', 1)
-                settings.setdefault('show_holidays', 1)
-                settings.setdefault('language', 'ru')
-                return settings
-            return None
+    """Получить настройки чата (из кэша, если он свежий)"""
+    cached = _settings_cache.get(chat_id)
+    if cached and time.monotonic() - cached[0] < SETTINGS_CACHE_TTL:
+        _settings_cache.move_to_end(chat_id)
+        return write_buffer.apply_pending(chat_id, _copy_settings(cached[1]))
+    
+    generation = _settings_cache_generation
+    settings = None
+    db = await get_db()
+    async with db.execute(
+        "SELECT * FROM chat_settings WHERE chat_id = ?", (chat_id,)
+    ) as cursor:
+        row = await cursor.fetchone()
+        if row:
+            settings = _row_to_settings(row)
+            # Установка значений по умолчанию для новых полей
+            settings.setdefault('show_location', 1)
+            settings.setdefault('prayer_names_style', 'standard')
+            settings.setdefault('hijri_style', 'cyrillic')
+            settings.setdefault('show_hijri', 1)
+            settings.setdefault('show_holidays', 1)
+            settings.setdefault('language', 'ru')
+    
+    if generation == _settings_cache_generation:
+        _cache_settings(chat_id, settings)
+    return write_buffer.apply_pending(chat_id, _copy_settings(settings))
+
+
+def _prepare_settings(kwargs: Dict[str, Any]) -> Tuple[Tuple[str, ...], List[Any]]:
+    """Проверить имена колонок по белому списку и сериализовать JSON поля"""
+    columns = tuple(kwargs)
+    values = []
+    for key in columns:
+        if key not in SETTINGS_COLUMNS:
+            raise ValueError(f"Unknown chat_settings column: {key}")
+        value = kwargs[key]
+        if key in JSON_COLUMNS:
+            value = json.dumps(value)
+        values.append(value)
+    return columns, values
+
+
+@lru_cache(maxsize=256)
+def _upsert_sql(columns: Tuple[str, ...]) -> str:
+    """SQL для INSERT ... ON CONFLICT(chat_id) DO UPDATE по набору колонок"""
+    insert_columns = ('chat_id', 'chat_type') + columns
+    placeholders = ', '.join('?' * len(insert_columns))
+    sql = f"INSERT INTO chat_settings ({', '.join(insert_columns)}) VALUES ({placeholders}) "
+    if not columns:
+        return sql + "ON CONFLICT(chat_id) DO NOTHING"
+    updates = ', '.join(f"{key} = excluded.{key}" for key in columns)
+    return sql + f"ON CONFLICT(chat_id) DO UPDATE SET {updates}, updated_at = CURRENT_TIMESTAMP"
 
 
 async def save_chat_settings(chat_id: int, chat_type: str = 'private', **kwargs):
-    """Сохранить настройки чата"""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        existing = await get_chat_settings(chat_id)
-        
-        if existing:
-            updates = []
-            values = []
-            for key, value in kwargs.items():
-                if key in ['prayer_offsets', 'reminders', 'enabled_prayers']:
-                    value = json.dumps(value)
-                updates.append(f"{key} = ?")
-                values.append(value)
-            
-            if updates:
-                values.append(chat_id)
-                await db.execute(
-                    f"UPDATE chat_settings SET {', '.join(updates)}, updated_at = CURRENT_TIMESTAMP WHERE chat_id = ?",
-                    values
-                )
-        else:
-            for key in ['prayer_offsets', 'reminders', 'enabled_prayers']:
-                if key in kwargs:
-                    kwargs[key] = json.dumps(kwargs[key])
-            
-            columns = ['chat_id', 'chat_type'] + list(kwargs.keys())
-            placeholders = ['?'] * len(columns)
-            values = [chat_id, chat_type] + list(kwargs.values())
-            
-            await db.execute(
-                f"INSERT INTO chat_settings ({', '.join(columns)}) VALUES ({', '.join(placeholders)})",
-                values
-            )
-        
+    """Сохранить настройки чата (один UPSERT: создаёт чат или обновляет переданные поля)"""
+    columns, values = _prepare_settings(kwargs)
+    
+    # Прямая запись важнее отложенной: убираем ожидающие значения этих полей
+    write_buffer.discard(chat_id, columns)
+    
+    db = await get_db()
+    async with _write_lock:
+        await db.execute(_upsert_sql(columns), [chat_id, chat_type, *values])
         await db.commit()
+        invalidate_settings_cache(chat_id)
+    
+    _notify_settings_changed(chat_id, columns)
+
+
+async def save_many_chat_settings(
+    updates: Dict[int, Dict[str, Any]],
+    chat_type: str = 'private',
+    notify: bool = True
+):
+    """Сохранить настройки нескольких чатов одной транзакцией"""
+    db = await get_db()
+    async with _write_lock:
+        # Значения берём уже под блокировкой: пока ждали, прямая запись могла убрать поля из updates
+        prepared = [
+            (chat_id, *_prepare_settings(fields))
+            for chat_id, fields in updates.items() if fields
+        ]
+        try:
+            for chat_id, columns, values in prepared:
+                await db.execute(_upsert_sql(columns), [chat_id, chat_type, *values])
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        for chat_id, _, _ in prepared:
+            invalidate_settings_cache(chat_id)
+    
+    if notify:
+        for chat_id, columns, _ in prepared:
+            _notify_settings_changed(chat_id, columns)
 
 
 async def get_all_active_chats() -> list:
     """Получить все активные чаты"""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute(
-            "SELECT * FROM chat_settings WHERE is_active = 1"
-        ) as cursor:
-            rows = await cursor.fetchall()
-            result = []
-            for row in rows:
-                settings = dict(row)
-                settings['prayer_offsets'] = json.loads(settings.get('prayer_offsets') or '{}')
-                settings['reminders'] = json.loads(settings.get('reminders') or '{}')
-                settings['enabled_prayers'] = json.loads(settings.get('enabled_prayers') or '[]')
-                result.append(settings)
-            return result
-
-
-async def get_chats_with_daily_schedule() -> list:
-    """Получить чаты с включенной ежедневной отправкой"""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute(
-            "SELECT * FROM chat_settings WHERE is_active = 1 AND daily_schedule_time IS NOT NULL"
-        ) as cursor:
-            rows = await cursor.fetchall()
-            result = []
-            for row in rows:
-                settings = dict(row)
-                settings['prayer_offsets'] = json.loads(settings.get('prayer_offsets') or '{}')
-                settings['reminders'] = json.loads(settings.get('reminders') or '{}')
-                settings['enabled_prayers'] = json.loads(settings.get('enabled_prayers') or '[]')
-                result.append(settings)
-            return result
-
-
-async def get_chats_with_reminders() -> list:
+    db = await get_db()
+    async with db.execute(
+        "SELECT * FROM chat_settings WHERE is_active = 1"
+    ) as cursor:
+        rows = await cursor.fetchall()
+        result = []
+        for row in rows:
+            result.append(_row_to_settings(row))
+        return result
+
+
+def _shard_clause(shards: Optional[Tuple[int, Iterable[int]]]) -> Tuple[str, list]:
+    """Условие "чат из этих шардов" для WHERE: shards = (число шардов, номера шардов)"""
+    if shards is None:
+        return "", []
+    shard_count, shard_ids = shards
+    shard_ids = sorted(shard_ids)
+    if not shard_ids:
+        return " AND 0", []
+    placeholders = ', '.join('?' * len(shard_ids))
+    return f" AND ABS(chat_id) % ? IN ({placeholders})", [shard_count, *shard_ids]
+
+
+async def get_chats_due_daily_schedule(
+    schedule_times: Iterable[str],
+    shards: Optional[Tuple[int, Iterable[int]]] = None
+) -> list:
+    """Получить чаты, которым ежедневное расписание нужно отправить в одно из указанных времён (HH:MM)"""
+    schedule_times = list(schedule_times)
+    if not schedule_times:
+        return []
+    placeholders = ', '.join('?' * len(schedule_times))
+    shard_sql, shard_params = _shard_clause(shards)
+    db = await get_db()
+    # Условие совпадает с частичным индексом idx_daily_schedule_time
+    async with db.execute(
+        "SELECT * FROM chat_settings "
+        f"WHERE is_active = 1 AND daily_schedule_time IS NOT NULL AND daily_schedule_time IN ({placeholders})" + shard_sql,
+        (*schedule_times, *shard_params)
+    ) as cursor:
+        rows = await cursor.fetchall()
+        return [_row_to_settings(row) for row in rows]
+
+
+async def get_chats_with_reminders(shards: Optional[Tuple[int, Iterable[int]]] = None) -> list:
     """Получить чаты с включенными напоминаниями"""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute(
-            "SELECT * FROM chat_settings WHERE is_active = 1 AND reminders != '{}'"
-        ) as cursor:
-            rows = await cursor.fetchall()
-            result = []
-            for row in rows:
-                settings = dict(row)
-                settings['prayer_offsets'] = json.loads(settings.get('prayer_offsets') or '{}')
-                settings['reminders'] = json.loads(settings.get('reminders') or '{}')
-                settings['enabled_prayers'] = json.loads(settings.get('enabled_prayers') or '[]')
-                result.append(settings)
-            return result
+    shard_sql, shard_params = _shard_clause(shards)
+    db = await get_db()
+    async with db.execute(
+        "SELECT * FROM chat_settings WHERE is_active = 1 AND reminders != '{}'" + shard_sql,
+        shard_params
+    ) as cursor:
+        rows = await cursor.fetchall()
+        result = []
+        for row in rows:
+            result.append(_row_to_settings(row))
+        return result
 
 async def set_chat_active_status(chat_id: int, is_active: bool):
     """Обновление статуса активности чата"""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    write_buffer.discard(chat_id, ('is_active',))
+    
+    db = await get_db()
+    async with _write_lock:
         await db.execute(
-            "UPDATE chat_settings SET is_active = ? WHERE chat_id = ?",
+            "UPDATE chat_settings SET is_active = ?, updated_at = CURRENT_TIMESTAMP WHERE chat_id = ?",
             (1 if is_active else 0, chat_id)
         )
-        await db.commit()
\ No newline at end of file
+        await db.commit()
+        invalidate_settings_cache(chat_id)
+    
+    _notify_settings_changed(chat_id, ('is_active',))
+
+
+async def get_changed_chat_ids(since: Optional[str]) -> Tuple[List[int], str]:
+    """
+    Чаты, настройки которых менялись начиная с момента since (время БД).
+    Возвращает их и текущее время БД - его нужно передать при следующем вызове.
+    """
+    db = await get_db()
+    async with db.execute("SELECT CURRENT_TIMESTAMP") as cursor:
+        now = (await cursor.fetchone())[0]
+    if since is None:
+        return [], now
+    async with db.execute(
+        "SELECT chat_id FROM chat_settings WHERE updated_at >= ?", (since,)
+    ) as cursor:
+        rows = await cursor.fetchall()
+    return [row[0] for row in rows], now
+
+
+async def renew_shard_leases(owner: str, shard_count: int, ttl: float) -> List[int]:
+    """
+    Продлить аренду шардов процессом owner и добрать свободные.
+    Шарды делятся поровну между живыми процессами (по shard_count // процессов, первым
+    по имени - на один больше, пока не кончится остаток): лишние отдаются,
+    шарды умерших процессов (аренда истекла) забираются.
+    """
+    now = time.time()
+    expires_at = now + ttl
+    db = await get_db()
+    async with _write_lock:
+        try:
+            # IMMEDIATE: другие процессы не перераспределяют шарды одновременно с нами
+            await db.execute("BEGIN IMMEDIATE")
+            await db.execute(
+                "INSERT INTO shard_workers (owner, expires_at) VALUES (?, ?) "
+                "ON CONFLICT(owner) DO UPDATE SET expires_at = excluded.expires_at",
+                (owner, expires_at)
+            )
+            await db.execute("DELETE FROM shard_workers WHERE expires_at < ?", (now,))
+            await db.execute(
+                "DELETE FROM shard_leases WHERE expires_at < ? OR shard_id >= ?", (now, shard_count)
+            )
+            
+            async with db.execute("SELECT owner FROM shard_workers ORDER BY owner") as cursor:
+                workers = [row[0] for row in await cursor.fetchall()]
+            base, remainder = divmod(shard_count, len(workers))
+            target = base + (workers.index(owner) < remainder)
+            
+            async with db.execute("SELECT shard_id, owner FROM shard_leases ORDER BY shard_id") as cursor:
+                leases = await cursor.fetchall()
+            owned = [shard_id for shard_id, lease_owner in leases if lease_owner == owner]
+            taken = {shard_id for shard_id, _ in leases}
+            
+            # Отдаём лишнее, чтобы новые процессы получили свою долю
+            for shard_id in owned[target:]:
+                await db.execute(
+                    "DELETE FROM shard_leases WHERE shard_id = ? AND owner = ?", (shard_id, owner)
+                )
+            owned = owned[:target]
+            
+            free = [shard_id for shard_id in range(shard_count) if shard_id not in taken]
+            for shard_id in free[:target - len(owned)]:
+                await db.execute(
+                    "INSERT INTO shard_leases (shard_id, owner, expires_at) VALUES (?, ?, ?)",
+                    (shard_id, owner, expires_at)
+                )
+                owned.append(shard_id)
+            
+            await db.execute(
+                "UPDATE shard_leases SET expires_at = ? WHERE owner = ?", (expires_at, owner)
+            )
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+    return sorted(owned)
+
+
+async def release_shard_leases(owner: str):
+    """Освободить все шарды процесса (при остановке)"""
+    db = await get_db()
+    async with _write_lock:
+        await db.execute("DELETE FROM shard_leases WHERE owner = ?", (owner,))
+        await db.execute("DELETE FROM shard_workers WHERE owner = ?", (owner,))
+        await db.commit()
+
+
+# Ключ записи журнала отправок: (chat_id, kind, target)
+DeliveryKey = Tuple[int, str, str]
+
+
+# Занять отправку: новой записи - вставка, 'pending' чужого процесса - только при
+# include_pending и если у владельца нет живой аренды шарда чата (процесс упал,
+# аренда истекла или шард передан). Отправки живого владельца не перехватываются,
+# даже если они долго стоят в его очереди
+_CLAIM_SQL = """
+    INSERT INTO delivery_journal (chat_id, kind, target, status, owner, updated_at)
+    VALUES (?, ?, ?, 'pending', ?, ?)
+    ON CONFLICT(chat_id, kind, target) DO UPDATE
+    SET owner = excluded.owner, updated_at = excluded.updated_at
+    WHERE delivery_journal.status = 'pending'
+        AND ?
+        AND delivery_journal.owner IS NOT excluded.owner
+        AND NOT EXISTS (
+            SELECT 1 FROM shard_leases
+            WHERE shard_leases.owner = delivery_journal.owner
+                AND shard_leases.shard_id = ABS(delivery_journal.chat_id) % ?
+                AND shard_leases.expires_at > ?
+        )
+"""
+
+# Метка последнего захвата: у каждого вызова claim_deliveries своя
+_last_claim = 0.0
+
+
+async def claim_deliveries(
+    keys: Iterable[DeliveryKey],
+    include_pending: bool = False,
+    owner: str = PROCESS_OWNER,
+    shard_count: int = SHARD_COUNT
+) -> Set[DeliveryKey]:
+    """
+    Отметить отправки как начатые (status = 'pending', владелец owner).
+    Возвращает ключи, которые можно отправлять: записи ещё не было, а при include_pending -
+    ещё и неподтверждённые отправки процессов, которые больше не владеют шардом чата.
+    Выполняется в BEGIN IMMEDIATE, поэтому два процесса не займут один ключ.
+    """
+    global _last_claim
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return set()
+    targets = sorted({target for _, _, target in keys})
+    placeholders = ', '.join('?' * len(targets))
+    
+    db = await get_db()
+    async with _write_lock:
+        now = time.time()
+        stamp = _last_claim = max(now, _last_claim + 1e-6)
+        try:
+            await db.execute("BEGIN IMMEDIATE")
+            await db.executemany(
+                _CLAIM_SQL,
+                [(*key, owner, stamp, int(include_pending), shard_count, now) for key in keys]
+            )
+            # Занятые этим вызовом - с нашим владельцем и нашей меткой
+            async with db.execute(
+                f"SELECT chat_id, kind, target FROM delivery_journal "
+                f"WHERE target IN ({placeholders}) AND status = 'pending' AND owner = ? AND updated_at = ?",
+                (*targets, owner, stamp)
+            ) as cursor:
+                claimed = {(row[0], row[1], row[2]) for row in await cursor.fetchall()}
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+    return claimed & set(keys)
+
+
+async def prune_delivery_journal(before_target: str):
+    """Удалить записи журнала отправок старше указанного момента"""
+    db = await get_db()
+    async with _write_lock:
+        await db.execute("DELETE FROM delivery_journal WHERE target < ?", (before_target,))
+        await db.commit()
+
+
+def _spawn(tasks: Set[asyncio.Task], coro) -> asyncio.Task:
+    """Запустить задачу и держать ссылку на неё до завершения (цикл хранит только слабые)"""
+    task = asyncio.create_task(coro)
+    tasks.add(task)
+    task.add_done_callback(tasks.discard)
+    return task
+
+
+class DeliveryJournal:
+    """
+    Итоговые статусы отправок ('sent' / 'failed').
+    Копятся в памяти и пишутся пачкой, как и отложенные настройки.
+    """
+
+    def __init__(self, interval: float = WRITE_BEHIND_INTERVAL, max_items: int = WRITE_BEHIND_MAX_ITEMS):
+        self.interval = interval
+        self.max_items = max_items
+        self.pending: Dict[DeliveryKey, Tuple[str, str]] = {}
+        self._timer: Optional[asyncio.Task] = None
+        # Запущенные внеочередные flush
+        self._tasks: Set[asyncio.Task] = set()
+        self._flush_lock = asyncio.Lock()
+        self.written = 0
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def mark(self, key: DeliveryKey, status: str, owner: str = PROCESS_OWNER):
+        """Записать итог отправки (только если отправку всё ещё держит owner)"""
+        self.pending[key] = (status, owner)
+        if len(self.pending) >= self.max_items:
+            _spawn(self._tasks, self.flush())
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        await self.flush()
+
+    async def flush(self):
+        """Записать накопленные статусы одной транзакцией"""
+        async with self._flush_lock:
+            if not self.pending:
+                return
+            batch, self.pending = self.pending, {}
+            now = time.time()
+            db = await get_db()
+            try:
+                async with _write_lock:
+                    try:
+                        # Запись, которую уже забрал другой процесс, не трогаем
+                        await db.executemany(
+                            "UPDATE delivery_journal SET status = ?, updated_at = ? "
+                            "WHERE chat_id = ? AND kind = ? AND target = ? AND owner = ?",
+                            [(status, now, *key, owner) for key, (status, owner) in batch.items()]
+                        )
+                        await db.commit()
+                    except Exception:
+                        await db.rollback()
+                        raise
+                self.written += len(batch)
+            except Exception as e:
+                logger.error(f"Ошибка записи журнала отправок ({len(batch)} записей): {e}")
+                for key, value in batch.items():
+                    self.pending.setdefault(key, value)
+                if self._timer is None or self._timer.done():
+                    self._timer = asyncio.create_task(self._flush_later())
+
+
+# Глобальный журнал отправок
+delivery_journal = DeliveryJournal()
+
+
+class WriteBehindBuffer:
+    """
+    Отложенная запись настроек и статусов активности.
+    Обновления копятся в памяти (по чату, последнее значение побеждает)
+    и пишутся одной транзакцией раз в WRITE_BEHIND_INTERVAL секунд
+    или сразу при WRITE_BEHIND_MAX_ITEMS чатах.
+    До записи get_chat_settings накладывает ожидающие значения на результат.
+    """
+
+    def __init__(self, interval: float = WRITE_BEHIND_INTERVAL, max_items: int = WRITE_BEHIND_MAX_ITEMS):
+        self.interval = interval
+        self.max_items = max_items
+        self.pending: Dict[int, Dict[str, Any]] = {}
+        # Пачка, которая сейчас пишется в БД (тоже видна при чтении)
+        self.inflight: Dict[int, Dict[str, Any]] = {}
+        self._timer: Optional[asyncio.Task] = None
+        # Запущенные внеочередные flush
+        self._tasks: Set[asyncio.Task] = set()
+        self._flush_lock = asyncio.Lock()
+        self.flushes = 0
+        self.written = 0
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def queue(self, chat_id: int, **fields):
+        """Поставить обновление полей чата в очередь на запись"""
+        _prepare_settings(fields)  # проверка имён колонок
+        self.pending.setdefault(chat_id, {}).update(fields)
+        _notify_settings_changed(chat_id, fields.keys())
+        
+        if len(self.pending) >= self.max_items:
+            _spawn(self._tasks, self.flush())
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+
+    def discard(self, chat_id: int, columns: Iterable[str]):
+        """
+        Убрать ожидающие значения полей (их перезаписала прямая запись).
+        Из пишущейся пачки тоже: flush берёт значения только под _write_lock,
+        поэтому старое значение не запишется поверх прямой записи.
+        """
+        columns = tuple(columns)
+        for source in (self.pending, self.inflight):
+            fields = source.get(chat_id)
+            if not fields:
+                continue
+            for key in columns:
+                fields.pop(key, None)
+            if not fields:
+                del source[chat_id]
+
+    def apply_pending(self, chat_id: int, settings: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Наложить ещё не записанные значения на настройки чата"""
+        if settings is None:
+            return None
+        for source in (self.inflight, self.pending):
+            fields = source.get(chat_id)
+            if fields:
+                settings.update(_copy_fields(fields))
+        return settings
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        await self.flush()
+
+    async def flush(self):
+        """Записать накопленные обновления одной транзакцией"""
+        async with self._flush_lock:
+            if not self.pending:
+                return
+            self.inflight, self.pending = self.pending, {}
+            try:
+                await save_many_chat_settings(self.inflight, notify=False)
+                self.flushes += 1
+                self.written += len(self.inflight)
+            except Exception as e:
+                logger.error(f"Ошибка отложенной записи ({len(self.inflight)} чатов): {e}")
+                # Возвращаем пачку в очередь, более новые значения важнее
+                for chat_id, fields in self.inflight.items():
+                    merged = dict(fields)
+                    merged.update(self.pending.get(chat_id, {}))
+                    self.pending[chat_id] = merged
+                if self._timer is None or self._timer.done():
+                    self._timer = asyncio.create_task(self._flush_later())
+            finally:
+                self.inflight = {}
+
+
+def _copy_fields(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Копия полей, чтобы изменения в хендлерах не портили буфер"""
+    return {
+        key: (value.copy() if key in JSON_COLUMNS and value is not None else value)
+        for key, value in fields.items()
+    }
+
+
+# Глобальный буфер отложенной записи
+write_buffer = WriteBehindBuffer()
+
+
+def queue_chat_settings(chat_id: int, **fields):
+    """
+    Отложенное сохранение настроек чата, которые уже есть в БД (переключатели вида).
+    Новый чат так не создать: до записи get_chat_settings его не видит.
+    """
+    write_buffer.queue(chat_id, **fields)
+
+
+def queue_chat_active_status(chat_id: int, is_active: bool):
+    """Отложенное обновление статуса активности чата"""
+    write_buffer.queue(chat_id, is_active=1 if is_active else 0)
+
+
+async def flush_pending_writes():
+    """Записать всё, что накоплено в буфере (вызывается при остановке бота)"""
+    # Если пачку сейчас пишет таймер, flush дождётся её и запишет остальное
+    await write_buffer.flush()
+    await delivery_journal.flush()
+    logger.info(
+        f"Отложенная запись: {write_buffer.flushes} транзакций, {write_buffer.written} чатов, "
+        f"статусов отправок: {delivery_journal.written}"
+    )
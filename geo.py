@@ -0,0 +1,91 @@
+"""
+Поиск ближайшего известного города по координатам.
+
+Города из LOCATION_COORDS переводятся в плоские координаты (км) и
+складываются в k-d дерево, поэтому поиск занимает O(log n).
+"""
+import math
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from config import LOCATION_COORDS, COORDS_REGION
+
+# Длина градуса широты, км
+KM_PER_DEGREE = 111.2
+
+
+class NearestCity(NamedTuple):
+    name: str
+    distance_km: float
+
+
+class _Node(NamedTuple):
+    point: Tuple[float, float]
+    name: str
+    axis: int
+    left: Optional["_Node"]
+    right: Optional["_Node"]
+
+
+class CityIndex:
+    """k-d дерево по городам (равнопромежуточная проекция вокруг средней широты)"""
+
+    def __init__(self, coords: Dict[str, Tuple[float, float]]):
+        latitudes = [lat for lat, _ in coords.values()]
+        base_latitude = sum(latitudes) / len(latitudes) if latitudes else 0.0
+        # Масштаб долготы для региона: на таких расстояниях погрешность проекции мала
+        self._lon_scale = math.cos(math.radians(base_latitude))
+        points = [(self._project(lat, lon), name) for name, (lat, lon) in coords.items()]
+        self._root = self._build(points, 0)
+
+    def _project(self, latitude: float, longitude: float) -> Tuple[float, float]:
+        return longitude * KM_PER_DEGREE * self._lon_scale, latitude * KM_PER_DEGREE
+
+    def _build(self, points: List[Tuple[Tuple[float, float], str]], depth: int) -> Optional[_Node]:
+        if not points:
+            return None
+        axis = depth % 2
+        points.sort(key=lambda p: p[0][axis])
+        middle = len(points) // 2
+        point, name = points[middle]
+        return _Node(
+            point, name, axis,
+            self._build(points[:middle], depth + 1),
+            self._build(points[middle + 1:], depth + 1)
+        )
+
+    def nearest(self, latitude: float, longitude: float) -> Optional[NearestCity]:
+        """Ближайший город и расстояние до него"""
+        target = self._project(latitude, longitude)
+        best_name = None
+        best_sq = math.inf
+
+        # В стеке: узел и квадрат расстояния до разделяющей плоскости родителя
+        stack = [(self._root, 0.0)]
+        while stack:
+            node, plane_sq = stack.pop()
+            # Ветвь дальше лучшего найденного - пропускаем
+            if node is None or plane_sq >= best_sq:
+                continue
+            dx = node.point[0] - target[0]
+            dy = node.point[1] - target[1]
+            distance_sq = dx * dx + dy * dy
+            if distance_sq < best_sq:
+                best_name, best_sq = node.name, distance_sq
+
+            delta = target[node.axis] - node.point[node.axis]
+            near, far = (node.left, node.right) if delta < 0 else (node.right, node.left)
+            stack.append((far, delta * delta))
+            stack.append((near, 0.0))
+
+        if best_name is None:
+            return None
+        return NearestCity(best_name, math.sqrt(best_sq))
+
+
+def in_coords_region(latitude: float, longitude: float) -> bool:
+    """Точка в регионе, где допустим расчёт по координатам (см. COORDS_REGION)"""
+    min_lat, max_lat, min_lon, max_lon = COORDS_REGION
+    return min_lat <= latitude <= max_lat and min_lon <= longitude <= max_lon
+
+
+# Глобальный индекс
+city_index = CityIndex(LOCATION_COORDS)
@@ -1,5 +1,5 @@
 from aiogram import Router, F, Bot
-from aiogram.types import CallbackQuery, Message
+from aiogram.types import CallbackQuery, Message, ReplyKeyboardRemove
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from keyboards.inline import (
@@ -7,8 +7,10 @@ from keyboards.inline import (
     offset_menu_keyboard, general_offset_keyboard,
     prayer_offsets_keyboard, prayer_offset_values_keyboard
 )
-from database import get_chat_settings, save_chat_settings
-from config import LOCATIONS, PRAYER_NAMES_STYLES
+from keyboards.reply import request_location_keyboard
+from database import get_chat_settings, save_chat_settings, queue_chat_settings
+from config import LOCATIONS, PRAYER_NAMES_STYLES, MAX_CITY_DISTANCE_KM, COORD_PRECISION
+from geo import city_index, in_coords_region
 from locales import get_text
 
 router = Router()
@@ -18,6 +20,7 @@ class LocationStates(StatesGroup):
     waiting_city_name = State()
     waiting_general_offset = State()
     waiting_prayer_offset = State()
+    waiting_geolocation = State()
 
 
 # === Вспомогательные функции для показа меню ===
@@ -99,11 +102,11 @@ async def _show_prayer_offsets_menu(chat_id: int, message: Message, lang: str):
 # === Основные обработчики ===
 
 @router.callback_query(F.data == "location")
-async def show_location(callback: CallbackQuery, state: FSMContext, _: callable, lang: str):
+async def show_location(callback: CallbackQuery, state: FSMContext, _: callable, lang: str, chat_settings: dict = None):
     """Показать выбор локации"""
     await state.clear()
     
-    settings = await get_chat_settings(callback.message.chat.id)
+    settings = chat_settings or await get_chat_settings(callback.message.chat.id)
     current = settings.get('location_name', 'Акъмесджит (Симферополь)') if settings else 'Акъмесджит (Симферополь)'
     offset = settings.get('time_offset', 0) if settings else 0
     show_loc = bool(settings.get('show_location', 1)) if settings else True
@@ -133,7 +136,7 @@ async def toggle_location_display(callback: CallbackQuery, state: FSMContext, _:
     """Переключение отображения названия города"""
     settings = await get_chat_settings(callback.message.chat.id)
     current = bool(settings.get('show_location', 1)) if settings else True
-    await save_chat_settings(callback.message.chat.id, show_location=0 if current else 1)
+    queue_chat_settings(callback.message.chat.id, show_location=0 if current else 1)
     await callback.answer(_("changed"))
     await show_location(callback, state, _, lang)
 
@@ -149,7 +152,9 @@ async def set_location_from_list(callback: CallbackQuery, state: FSMContext, _:
                 callback.message.chat.id,
                 location_name=name,
                 time_offset=offset,
-                prayer_offsets={}
+                prayer_offsets={},
+                latitude=None,
+                longitude=None
             )
             await callback.answer(f"✅ {name} ({offset:+d} {_('minutes')})")
             await show_location(callback, state, _, lang)
@@ -169,6 +174,76 @@ async def custom_location_menu(callback: CallbackQuery, state: FSMContext, _: ca
     await callback.answer()
 
 
+# === Геопозиция ===
+
+@router.callback_query(F.data == "request_geolocation")
+async def request_geolocation(callback: CallbackQuery, state: FSMContext, _: callable, lang: str):
+    """Попросить отправить геопозицию"""
+    # Геопозицию принимаем только от того, кто нажал кнопку, и только в этом состоянии
+    await state.set_state(LocationStates.waiting_geolocation)
+    # Кнопка запроса геопозиции работает только в личных чатах
+    markup = request_location_keyboard(lang) if callback.message.chat.type == "private" else None
+    await callback.message.answer(_("send_location_prompt"), reply_markup=markup)
+    await callback.answer()
+
+
+@router.message(LocationStates.waiting_geolocation, F.location)
+async def process_geolocation(message: Message, state: FSMContext, _: callable, lang: str):
+    """
+    Выбор ближайшего города по присланной геопозиции.
+    Если известных городов рядом нет, времена считаются по координатам (astronomy.py) -
+    только в пределах COORDS_REGION, иначе геопозиция отклоняется.
+    """
+    await state.clear()
+    
+    latitude, longitude = message.location.latitude, message.location.longitude
+    nearest = city_index.nearest(latitude, longitude)
+    
+    if nearest is None or nearest.distance_km > MAX_CITY_DISTANCE_KM:
+        if not in_coords_region(latitude, longitude):
+            # Расчёт по координатам идёт по часам и поправкам бота - вне региона он неверен
+            text = (
+                _("location_too_far").format(name=nearest.name, distance=round(nearest.distance_km))
+                if nearest else _("error")
+            )
+            await message.answer(text, reply_markup=ReplyKeyboardRemove(), parse_mode="HTML")
+            return
+        latitude, longitude = round(latitude, COORD_PRECISION), round(longitude, COORD_PRECISION)
+        coords_name = f"{latitude:.{COORD_PRECISION}f}, {longitude:.{COORD_PRECISION}f}"
+        await save_chat_settings(
+            message.chat.id,
+            chat_type=message.chat.type,
+            location_name=coords_name,
+            time_offset=0,
+            prayer_offsets={},
+            latitude=latitude,
+            longitude=longitude
+        )
+        await message.answer(
+            _("location_by_coords").format(coords=coords_name),
+            reply_markup=ReplyKeyboardRemove(),
+            parse_mode="HTML"
+        )
+        return
+    
+    distance = round(nearest.distance_km)
+    offset = dict(LOCATIONS)[nearest.name]
+    await save_chat_settings(
+        message.chat.id,
+        chat_type=message.chat.type,
+        location_name=nearest.name,
+        time_offset=offset,
+        prayer_offsets={},
+        latitude=None,
+        longitude=None
+    )
+    await message.answer(
+        _("location_detected").format(name=nearest.name, distance=distance, offset=offset),
+        reply_markup=ReplyKeyboardRemove(),
+        parse_mode="HTML"
+    )
+
+
 # === Ввод названия ===
 
 @router.callback_query(F.data == "enter_city_name")
@@ -8,9 +8,9 @@ router = Router()
 
 
 @router.callback_query(F.data == "reminders")
-async def show_reminders(callback: CallbackQuery, _: callable, lang: str):
+async def show_reminders(callback: CallbackQuery, _: callable, lang: str, chat_settings: dict = None):
     """Показать настройки напоминаний"""
-    settings = await get_chat_settings(callback.message.chat.id)
+    settings = chat_settings or await get_chat_settings(callback.message.chat.id)
     reminders = settings.get('reminders', {}) if settings else {}
     prayer_names_style = settings.get('prayer_names_style', 'standard') if settings else 'standard'
     
@@ -1,10 +1,11 @@
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, Message
+from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from keyboards.inline import schedule_keyboard, date_navigation_keyboard
+from keyboards.inline import schedule_keyboard, date_navigation_keyboard, month_navigation_keyboard
 from database import get_chat_settings, save_chat_settings
-from prayer_times import prayer_manager
+from prayer_times import prayer_manager, settings_coords
 from datetime import datetime, timedelta, date
 import pytz
 from config import TIMEZONE, PRAYER_NAMES_STYLES, ADMIN_ID
@@ -37,9 +38,10 @@ async def show_schedule_menu(callback: CallbackQuery, _: callable, lang: str):
     await callback.answer()
 
 
-async def get_schedule_text(chat_id: int, target_date: date, lang: str) -> str:
+async def get_schedule_text(chat_id: int, target_date: date, lang: str, settings: dict = None) -> str:
     """Получить текст расписания для даты"""
-    settings = await get_chat_settings(chat_id)
+    if settings is None:
+        settings = await get_chat_settings(chat_id)
     if not settings:
         settings = {}
     
@@ -54,17 +56,18 @@ async def get_schedule_text(chat_id: int, target_date: date, lang: str) -> str:
         show_hijri=bool(settings.get('show_hijri', 1)),
         hijri_style=settings.get('hijri_style', 'translit'),
         show_holidays=bool(settings.get('show_holidays', 1)),
-        lang=lang
+        lang=lang,
+        coords=settings_coords(settings)
     )
 
 
 @router.callback_query(F.data == "schedule_today")
-async def schedule_today(callback: CallbackQuery, _: callable, lang: str):
+async def schedule_today(callback: CallbackQuery, _: callable, lang: str, chat_settings: dict = None):
     """Расписание на сегодня"""
     tz = pytz.timezone(TIMEZONE)
     today = datetime.now(tz).date()
     
-    text = await get_schedule_text(callback.message.chat.id, today, lang)
+    text = await get_schedule_text(callback.message.chat.id, today, lang, chat_settings)
     
     # Игнорируем ошибку, если текст не изменился
     with suppress(TelegramBadRequest):
@@ -79,12 +82,12 @@ async def schedule_today(callback: CallbackQuery, _: callable, lang: str):
 
 
 @router.callback_query(F.data == "schedule_tomorrow")
-async def schedule_tomorrow(callback: CallbackQuery, _: callable, lang: str):
+async def schedule_tomorrow(callback: CallbackQuery, _: callable, lang: str, chat_settings: dict = None):
     """Расписание на завтра"""
     tz = pytz.timezone(TIMEZONE)
     tomorrow = datetime.now(tz).date() + timedelta(days=1)
     
-    text = await get_schedule_text(callback.message.chat.id, tomorrow, lang)
+    text = await get_schedule_text(callback.message.chat.id, tomorrow, lang, chat_settings)
     
     with suppress(TelegramBadRequest):
         await callback.message.edit_text(
@@ -95,6 +98,83 @@ async def schedule_tomorrow(callback: CallbackQuery, _: callable, lang: str):
     await callback.answer()
 
 
+async def get_month_text(chat_id: int, year: int, month: int, lang: str, settings: dict = None) -> str:
+    """Получить таблицу расписания на месяц"""
+    if settings is None:
+        settings = await get_chat_settings(chat_id)
+    if not settings:
+        settings = {}
+    
+    return prayer_manager.format_month(
+        year=year,
+        month=month,
+        general_offset=settings.get('time_offset', 0),
+        prayer_offsets=settings.get('prayer_offsets', {}),
+        location_name=settings.get('location_name', 'Симферополь'),
+        enabled_prayers=settings.get('enabled_prayers'),
+        show_location=bool(settings.get('show_location', 1)),
+        prayer_names_style=settings.get('prayer_names_style', 'standard'),
+        show_hijri=bool(settings.get('show_hijri', 1)),
+        hijri_style=settings.get('hijri_style', 'translit'),
+        show_holidays=bool(settings.get('show_holidays', 1)),
+        lang=lang,
+        coords=settings_coords(settings)
+    )
+
+
+@router.message(Command("month"))
+async def cmd_month(message: Message, _: callable, lang: str, chat_settings: dict = None):
+    """Команда /month - расписание на текущий месяц"""
+    tz = pytz.timezone(TIMEZONE)
+    today = datetime.now(tz).date()
+    
+    text = await get_month_text(message.chat.id, today.year, today.month, lang, chat_settings)
+    
+    await message.answer(
+        text,
+        reply_markup=month_navigation_keyboard(today.year, today.month, lang),
+        parse_mode="HTML"
+    )
+
+
+@router.callback_query(F.data == "schedule_month")
+async def schedule_month(callback: CallbackQuery, _: callable, lang: str, chat_settings: dict = None):
+    """Расписание на текущий месяц"""
+    tz = pytz.timezone(TIMEZONE)
+    today = datetime.now(tz).date()
+    
+    text = await get_month_text(callback.message.chat.id, today.year, today.month, lang, chat_settings)
+    
+    with suppress(TelegramBadRequest):
+        await callback.message.edit_text(
+            text,
+            reply_markup=month_navigation_keyboard(today.year, today.month, lang),
+            parse_mode="HTML"
+        )
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("month_nav_"))
+async def navigate_month(callback: CallbackQuery, _: callable, lang: str, chat_settings: dict = None):
+    """Навигация по месяцам"""
+    try:
+        year, month = map(int, callback.data.replace("month_nav_", "").split("-"))
+        date(year, month, 1)
+    except ValueError:
+        await callback.answer(_("error"), show_alert=True)
+        return
+    
+    text = await get_month_text(callback.message.chat.id, year, month, lang, chat_settings)
+    
+    with suppress(TelegramBadRequest):
+        await callback.message.edit_text(
+            text,
+            reply_markup=month_navigation_keyboard(year, month, lang),
+            parse_mode="HTML"
+        )
+    await callback.answer()
+
+
 @router.callback_query(F.data == "schedule_custom_date")
 async def schedule_custom_date(callback: CallbackQuery, _: callable, lang: str):
     """Показать выбор даты (только для админов)"""
@@ -222,9 +302,9 @@ async def process_custom_date(message: Message, state: FSMContext):
 
 
 @router.callback_query(F.data == "next_prayer")
-async def next_prayer(callback: CallbackQuery, _: callable, lang: str):
+async def next_prayer(callback: CallbackQuery, _: callable, lang: str, chat_settings: dict = None):
     """Следующий намаз"""
-    settings = await get_chat_settings(callback.message.chat.id)
+    settings = chat_settings or await get_chat_settings(callback.message.chat.id)
     if not settings:
         settings = {}
     
@@ -233,7 +313,8 @@ async def next_prayer(callback: CallbackQuery, _: callable, lang: str):
     
     result = prayer_manager.get_next_prayer(
         general_offset=settings.get('time_offset', 0),
-        prayer_offsets=settings.get('prayer_offsets', {})
+        prayer_offsets=settings.get('prayer_offsets', {}),
+        coords=settings_coords(settings)
     )
     
     if result:
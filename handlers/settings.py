@@ -8,7 +8,7 @@ from keyboards.inline import (
     hijri_settings_keyboard, holidays_settings_keyboard,
     language_keyboard
 )
-from database import get_chat_settings, save_chat_settings
+from database import get_chat_settings, save_chat_settings, queue_chat_settings
 from locales import get_text
 
 router = Router()
@@ -18,9 +18,9 @@ class SettingsStates(StatesGroup):
     waiting_custom_time = State()
 
 
-async def show_settings_message(message: Message, _: callable, lang: str):
+async def show_settings_message(message: Message, _: callable, lang: str, chat_settings: dict = None):
     """Показать настройки как сообщение"""
-    settings = await get_chat_settings(message.chat.id)
+    settings = chat_settings or await get_chat_settings(message.chat.id)
     
     if not settings:
         await save_chat_settings(message.chat.id, message.chat.type)
@@ -54,9 +54,9 @@ async def show_settings_message(message: Message, _: callable, lang: str):
 
 
 @router.callback_query(F.data == "settings")
-async def show_settings(callback: CallbackQuery, _: callable, lang: str):
+async def show_settings(callback: CallbackQuery, _: callable, lang: str, chat_settings: dict = None):
     """Показать настройки"""
-    settings = await get_chat_settings(callback.message.chat.id)
+    settings = chat_settings or await get_chat_settings(callback.message.chat.id)
     
     auto_time = settings.get('daily_schedule_time') if settings else None
     day = settings.get('schedule_day', 'today') if settings else 'today'
@@ -112,7 +112,8 @@ async def settings_prayer_names(callback: CallbackQuery, _: callable, lang: str)
 async def set_prayer_style(callback: CallbackQuery, _: callable, lang: str):
     """Установка стиля названий"""
     style = callback.data.replace("set_prayer_style_", "")
-    await save_chat_settings(callback.message.chat.id, prayer_names_style=style)
+    # Настройки вида пишутся отложенно, get_chat_settings уже видит новое значение
+    queue_chat_settings(callback.message.chat.id, prayer_names_style=style)
     await callback.answer(_("style_changed"))
     await settings_prayer_names(callback, _, lang)
 
@@ -165,7 +166,7 @@ async def toggle_hijri(callback: CallbackQuery, _: callable, lang: str):
     """Переключение отображения хиджри"""
     settings = await get_chat_settings(callback.message.chat.id)
     current = bool(settings.get('show_hijri', 1)) if settings else True
-    await save_chat_settings(callback.message.chat.id, show_hijri=0 if current else 1)
+    queue_chat_settings(callback.message.chat.id, show_hijri=0 if current else 1)
     await callback.answer(_("changed"))
     await settings_hijri(callback, _, lang)
 
@@ -174,7 +175,7 @@ async def toggle_hijri(callback: CallbackQuery, _: callable, lang: str):
 async def set_hijri_style(callback: CallbackQuery, _: callable, lang: str):
     """Установка стиля хиджри (arabic или translit)"""
     style = callback.data.replace("set_hijri_style_", "")
-    await save_chat_settings(callback.message.chat.id, hijri_style=style)
+    queue_chat_settings(callback.message.chat.id, hijri_style=style)
     await callback.answer(_("style_changed"))
     await settings_hijri(callback, _, lang)
 
@@ -209,7 +210,7 @@ async def toggle_holidays(callback: CallbackQuery, _: callable, lang: str):
     """Переключение отображения праздников"""
     settings = await get_chat_settings(callback.message.chat.id)
     current = bool(settings.get('show_holidays', 1)) if settings else True
-    await save_chat_settings(callback.message.chat.id, show_holidays=0 if current else 1)
+    queue_chat_settings(callback.message.chat.id, show_holidays=0 if current else 1)
     await callback.answer(_("changed"))
     await settings_holidays(callback, _, lang)
 
@@ -278,11 +279,14 @@ async def process_custom_time(message: Message, state: FSMContext):
     
     time_pattern = re.compile(r'^([01]?[0-9]|2[0-3]):([0-5][0-9])$')
     
-    if time_pattern.match(message.text):
-        await save_chat_settings(message.chat.id, daily_schedule_time=message.text)
+    match = time_pattern.match(message.text)
+    if match:
+        # Приводим к формату HH:MM, по которому планировщик ищет чаты
+        schedule_time = f"{int(match.group(1)):02d}:{match.group(2)}"
+        await save_chat_settings(message.chat.id, daily_schedule_time=schedule_time)
         await state.clear()
         await message.answer(
-            f"{_('time_set')} {message.text}\n\n"
+            f"{_('time_set')} {schedule_time}\n\n"
             f"{_('use_start_menu')}"
         )
     else:
@@ -334,16 +338,14 @@ async def set_language(callback: CallbackQuery):
     # Поэтому берем новый код языка
     new_lang = callback.data.replace("set_lang_", "")
     
-    # Сохраняем настройки в БД
-    await save_chat_settings(callback.message.chat.id, language=new_lang)
-    
     prayer_style = "standard"
     if new_lang == "crh_lat":
         prayer_style = "crimean_latin"
     elif new_lang == "crh_cyr":
         prayer_style = "crimean_cyrillic"
-        
-    await save_chat_settings(callback.message.chat.id, prayer_names_style=prayer_style)
+    
+    # Сохраняем язык и стиль названий одним запросом
+    await save_chat_settings(callback.message.chat.id, language=new_lang, prayer_names_style=prayer_style)
     
     # Отправляем всплывающее уведомление на новом языке
     text = get_text(new_lang, "changed_lang")
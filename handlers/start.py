@@ -2,8 +2,8 @@ from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, FSInputFile
 from aiogram.filters import CommandStart, Command
 from keyboards.inline import main_menu_keyboard, schedule_keyboard, help_keyboard
-from database import save_chat_settings, get_chat_settings
-from prayer_times import prayer_manager
+from database import save_chat_settings, get_chat_settings, backup_database
+from prayer_times import prayer_manager, settings_coords
 from datetime import datetime, timedelta, date
 import pytz
 from config import TIMEZONE, PRAYER_NAMES_STYLES, HOLIDAYS, ADMIN_ID
@@ -30,10 +30,10 @@ async def cmd_start(message: Message, _: callable, lang: str):
 
 
 @router.message(Command("settings"))
-async def cmd_settings(message: Message, _: callable, lang: str):
+async def cmd_settings(message: Message, _: callable, lang: str, chat_settings: dict = None):
     """Команда /settings"""
     from handlers.settings import show_settings_message
-    await show_settings_message(message, _, lang)
+    await show_settings_message(message, _, lang, chat_settings)
 
 
 @router.callback_query(F.data == "main_menu")
@@ -59,6 +59,7 @@ async def show_help(callback: CallbackQuery, _: callable, lang: str):
         f"{_('help_cmd_schedule')}\n"
         f"{_('help_cmd_tomorrow')}\n"
         f"{_('help_cmd_next')}\n"
+        f"{_('help_cmd_month')}\n"
         f"{_('help_cmd_settings')}\n"
         f"{_('help_cmd_holidays')}\n\n"
         f"{_('help_settings_title')}\n"
@@ -161,9 +162,9 @@ async def cmd_holidays(message: Message, _: callable, lang: str):
 
 
 @router.message(Command("schedule"))
-async def cmd_schedule(message: Message, _: callable, lang: str):
+async def cmd_schedule(message: Message, _: callable, lang: str, chat_settings: dict = None):
     """Команда /schedule - расписание на сегодня"""
-    settings = await get_chat_settings(message.chat.id)
+    settings = chat_settings or await get_chat_settings(message.chat.id)
     if not settings:
         await save_chat_settings(message.chat.id, message.chat.type)
         settings = await get_chat_settings(message.chat.id)
@@ -182,7 +183,8 @@ async def cmd_schedule(message: Message, _: callable, lang: str):
         show_hijri=bool(settings.get('show_hijri', 1)),
         hijri_style=settings.get('hijri_style', 'translit'),
         show_holidays=bool(settings.get('show_holidays', 1)),
-        lang=lang
+        lang=lang,
+        coords=settings_coords(settings)
     )
     
     await message.answer(
@@ -193,9 +195,9 @@ async def cmd_schedule(message: Message, _: callable, lang: str):
 
 
 @router.message(Command("tomorrow"))
-async def cmd_tomorrow(message: Message, _: callable, lang: str):
+async def cmd_tomorrow(message: Message, _: callable, lang: str, chat_settings: dict = None):
     """Команда /tomorrow - расписание на завтра"""
-    settings = await get_chat_settings(message.chat.id)
+    settings = chat_settings or await get_chat_settings(message.chat.id)
     if not settings:
         await save_chat_settings(message.chat.id, message.chat.type)
         settings = await get_chat_settings(message.chat.id)
@@ -214,7 +216,8 @@ async def cmd_tomorrow(message: Message, _: callable, lang: str):
         show_hijri=bool(settings.get('show_hijri', 1)),
         hijri_style=settings.get('hijri_style', 'translit'),
         show_holidays=bool(settings.get('show_holidays', 1)),
-        lang=lang
+        lang=lang,
+        coords=settings_coords(settings)
     )
     
     await message.answer(
@@ -225,9 +228,9 @@ async def cmd_tomorrow(message: Message, _: callable, lang: str):
 
 
 @router.message(Command("next"))
-async def cmd_next(message: Message, _: callable, lang: str):
+async def cmd_next(message: Message, _: callable, lang: str, chat_settings: dict = None):
     """Команда /next - следующий намаз"""
-    settings = await get_chat_settings(message.chat.id)
+    settings = chat_settings or await get_chat_settings(message.chat.id)
     if not settings:
         await save_chat_settings(message.chat.id, message.chat.type)
         settings = await get_chat_settings(message.chat.id)
@@ -239,7 +242,8 @@ async def cmd_next(message: Message, _: callable, lang: str):
     
     result = prayer_manager.get_next_prayer(
         general_offset=settings.get('time_offset', 0),
-        prayer_offsets=settings.get('prayer_offsets', {})
+        prayer_offsets=settings.get('prayer_offsets', {}),
+        coords=settings_coords(settings)
     )
     
     if result:
@@ -285,9 +289,19 @@ async def cmd_reload(message: Message, _: callable, lang: str):
         return
     
     try:
-        prayer_manager.load_data()
-        rows = len(prayer_manager.df)
-        await message.answer(f"✅ Данные перезагружены\n📊 Загружено {rows} дней")
+        report = await prayer_manager.reload_data()
+        months = prayer_manager.load_hijri_calendar()
+        status = "✅ Данные перезагружены" if report.loaded else "⚠️ Новые данные не загружены, оставлены прежние"
+        text = (
+            f"{status}\n"
+            f"📂 Файлов: {len(report.files)}\n"
+            f"📊 Загружено {report.loaded} дней, отброшено строк: {report.rejected}\n"
+            f"🗓 Календарь хиджры {prayer_manager.hijri_version}: {months} месяцев "
+            f"(до {prayer_manager.hijri_covered_until})"
+        )
+        if report.errors:
+            text += "\n\n" + "\n".join(report.errors[:10])
+        await message.answer(text, parse_mode=None)
     except Exception as e:
         await message.answer(f"{_('error')}: {e}")
 
@@ -306,8 +320,11 @@ async def cmd_export(message: Message, _: callable, lang: str):
         await message.answer(f"{_('error')}: База не найдена")
         return
     
+    # Отправляем согласованную копию: в самом файле БД нет записей из WAL
+    backup_path = DATABASE_PATH + ".export"
     try:
-        file = FSInputFile(DATABASE_PATH, filename="prayer_bot_backup.db")
+        await backup_database(backup_path)
+        file = FSInputFile(backup_path, filename="prayer_bot_backup.db")
         await message.answer_document(
             file,
             caption=f"📦 <b>Экспорт базы данных</b>\n\n"
@@ -315,4 +332,7 @@ async def cmd_export(message: Message, _: callable, lang: str):
             parse_mode="HTML"
         )
     except Exception as e:
-        await message.answer(f"{_('error')}: {e}")
\ No newline at end of file
+        await message.answer(f"{_('error')}: {e}")
+    finally:
+        if os.path.exists(backup_path):
+            os.remove(backup_path)
\ No newline at end of file
@@ -42,7 +42,8 @@ def schedule_keyboard(is_admin: bool = False, lang: str = "ru") -> InlineKeyboar
         InlineKeyboardButton(text=_("btn_tomorrow"), callback_data="schedule_tomorrow")
     )
     builder.row(
-        InlineKeyboardButton(text=_("btn_next_prayer"), callback_data="next_prayer")
+        InlineKeyboardButton(text=_("btn_next_prayer"), callback_data="next_prayer"),
+        InlineKeyboardButton(text=_("btn_month"), callback_data="schedule_month")
     )
     
     if is_admin:
@@ -79,6 +80,26 @@ def date_navigation_keyboard(current_date: str, lang: str = "ru") -> InlineKeybo
     return builder.as_markup()
 
 
+def month_navigation_keyboard(year: int, month: int, lang: str = "ru") -> InlineKeyboardMarkup:
+    """Навигация по месяцам"""
+    _ = lambda key: get_text(lang, key)
+    builder = InlineKeyboardBuilder()
+    
+    prev_year, prev_month = (year, month - 1) if month > 1 else (year - 1, 12)
+    next_year, next_month = (year, month + 1) if month < 12 else (year + 1, 1)
+    
+    builder.row(
+        InlineKeyboardButton(text="◀️", callback_data=f"month_nav_{prev_year}-{prev_month:02d}"),
+        InlineKeyboardButton(text=_("btn_today"), callback_data="schedule_today"),
+        InlineKeyboardButton(text="▶️", callback_data=f"month_nav_{next_year}-{next_month:02d}"),
+    )
+    builder.row(
+        InlineKeyboardButton(text=_("btn_back"), callback_data="schedule")
+    )
+    
+    return builder.as_markup()
+
+
 def settings_keyboard(lang: str = "ru") -> InlineKeyboardMarkup:
     """Меню настроек"""
     _ = lambda key: get_text(lang, key)
@@ -328,6 +349,9 @@ def custom_location_menu_keyboard(lang: str = "ru") -> InlineKeyboardMarkup:
     _ = lambda key: get_text(lang, key)
     builder = InlineKeyboardBuilder()
     
+    builder.row(
+        InlineKeyboardButton(text=_("btn_send_location"), callback_data="request_geolocation")
+    )
     builder.row(
         InlineKeyboardButton(text=_("btn_enter_name"), callback_data="enter_city_name")
     )
@@ -0,0 +1,12 @@
+from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
+from aiogram.utils.keyboard import ReplyKeyboardBuilder
+from locales import get_text
+
+
+def request_location_keyboard(lang: str = "ru") -> ReplyKeyboardMarkup:
+    """Кнопка отправки геопозиции (только в личных чатах)"""
+    builder = ReplyKeyboardBuilder()
+    builder.row(
+        KeyboardButton(text=get_text(lang, "btn_send_location"), request_location=True)
+    )
+    return builder.as_markup(resize_keyboard=True, one_time_keyboard=True)
@@ -0,0 +1,58 @@
+"""
+Запуск бота в шардированном режиме.
+
+Использование:
+    python launcher.py [число_планировщиков]
+
+Поднимает один процесс с ролью bot (приём обновлений) и N процессов
+с ролью scheduler (по умолчанию - по числу ядер). Планировщики делят
+шарды чатов через таблицу аренды в БД и общий лимит рассылки.
+Если любой процесс завершился, останавливаются все.
+"""
+import os
+import signal
+import subprocess
+import sys
+import time
+from config import SHARD_COUNT
+
+
+def spawn(role: str, processes: int) -> subprocess.Popen:
+    env = dict(os.environ, ROLE=role, SCHEDULER_PROCESSES=str(processes))
+    return subprocess.Popen([sys.executable, "bot.py"], env=env)
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1)
+    processes = max(1, min(processes, SHARD_COUNT))
+    
+    children = [spawn("bot", processes)]
+    children += [spawn("scheduler", processes) for _ in range(processes)]
+    print(f"Запущено: 1 bot + {processes} scheduler, шардов: {SHARD_COUNT}")
+    
+    stopping = False
+    
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+    
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    
+    while not stopping and all(child.poll() is None for child in children):
+        time.sleep(1)
+    
+    for child in children:
+        if child.poll() is None:
+            child.send_signal(signal.SIGINT)
+    for child in children:
+        try:
+            child.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            child.kill()
+    
+    sys.exit(max((child.returncode or 0) for child in children))
+
+
+if __name__ == "__main__":
+    main()
@@ -17,12 +17,14 @@ TEXTS = {
         "btn_today": "📅 Сегодня",
         "btn_tomorrow": "📅 Завтра",
         "btn_next_prayer": "⏰ Следующий намаз",
+        "btn_month": "🗓 Месяц",
         "btn_select_date": "📆 Выбрать дату",
         "btn_back": "◀️ Назад",
         
         # === Расписание ===
         "schedule_title": "📅 <b>Расписание намаза</b>\n\nВыберите день:",
         "schedule_header": "🕌 <b>Расписание намаза</b>",
+        "month_header": "🕌 <b>Расписание намаза — {month} {year}</b>",
         "schedule_not_found": "❌ Расписание на эту дату не найдено",
         "next_prayer_title": "⏰ <b>Следующий намаз</b>",
         "next_prayer_time": "🕐 Время:",
@@ -137,6 +139,11 @@ TEXTS = {
         "location_select": "Выберите ваш город или укажите другой:",
         "btn_show_location": "Показывать локацию в расписании",
         "btn_other_location": "🏙 Другая локация",
+        "btn_send_location": "📍 Отправить геопозицию",
+        "send_location_prompt": "📍 Отправьте геопозицию (кнопкой ниже или через 📎 → Геопозиция), и бот выберет ближайший город",
+        "location_detected": "✅ Ближайший город: <b>{name}</b> ({distance} км)\nСмещение: <b>{offset:+d} мин</b>",
+        "location_by_coords": "✅ Рядом нет городов из списка, времена рассчитаны по координатам: <b>{coords}</b>",
+        "location_too_far": "❌ Ближайший известный город — <b>{name}</b>, до него {distance} км.\nВыберите город из списка или задайте смещение вручную.",
         "location_changed": "✅ Изменено",
         
         # === Другая локация ===
@@ -189,6 +196,7 @@ TEXTS = {
         "help_cmd_schedule": "/schedule — расписание на сегодня",
         "help_cmd_tomorrow": "/tomorrow — расписание на завтра",
         "help_cmd_next": "/next — ближайший намаз",
+        "help_cmd_month": "/month — расписание на месяц",
         "help_cmd_settings": "/settings — настройки бота",
         "help_cmd_holidays": "/holidays — список праздников",
         "help_settings_title": "<b>Описание настроек:</b>",
@@ -221,6 +229,7 @@ TEXTS = {
         "friday": "ПЯТНИЦА",
         "saturday": "Суббота",
         "sunday": "Воскресение",
+        "weekdays_short": "Пн Вт Ср Чт Пт Сб Вс",
         
         # === Месяцы ===
         "january": "января",
@@ -283,12 +292,14 @@ TEXTS = {
         "btn_today": "📅 Бугунь",
         "btn_tomorrow": "📅 Ярын",
         "btn_next_prayer": "⏰ Невбеттеки намаз",
+        "btn_month": "🗓 Ай",
         "btn_select_date": "📆 Тарихни сайламакъ",
         "btn_back": "◀️ Арткъа",
         
         # === Расписание ===
         "schedule_title": "📅 <b>Намаз вакъытлары</b>\n\nКуньни сайланъыз:",
         "schedule_header": "🕌 <b>Намаз вакъытлары</b>",
+        "month_header": "🕌 <b>Намаз вакъытлары — {month} {year}</b>",
         "schedule_not_found": "❌ Бу тарихке джедвель тапылмады",
         "next_prayer_title": "⏰ <b>Невбеттеки намаз</b>",
         "next_prayer_time": "🕐 Вакъыт:",
@@ -403,6 +414,11 @@ TEXTS = {
         "location_select": "Шээринъизни сайланъыз я да башкъа ер бельгиленъиз:",
         "btn_show_location": "Джедвельде ерни косьтермек",
         "btn_other_location": "🏙 Башкъа ер",
+        "btn_send_location": "📍 Ерлешювни ёлламакъ",
+        "send_location_prompt": "📍 Ерлешювинъизни ёлланъыз (ашагъыдаки кнопка я да 📎 → Ерлешюв ярдымынен), бот энъ якъын шеэрни сайлар",
+        "location_detected": "✅ Энъ якъын шеэр: <b>{name}</b> ({distance} км)\nТюзетюв: <b>{offset:+d} дакъкъа</b>",
+        "location_by_coords": "✅ Якъында джедвельдеки шеэрлер ёкъ, вакъытлар координаталар боюнджа эсапланды: <b>{coords}</b>",
+        "location_too_far": "❌ Энъ якъын бильген шеэр — <b>{name}</b>, {distance} км узакълыкъта.\nШеэрни джедвельден сайланъыз я да тюзетювни эльнен бельгиленъиз.",
         "location_changed": "✅ Денъиштирилди",
         
         # === Другая локация ===
@@ -455,6 +471,7 @@ TEXTS = {
         "help_cmd_schedule": "/schedule — бугуньки джедвель",
         "help_cmd_tomorrow": "/tomorrow — ярынки джедвель",
         "help_cmd_next": "/next — невбеттеки намаз",
+        "help_cmd_month": "/month — айлыкъ джедвель",
         "help_cmd_settings": "/settings — бот сазламалары",
         "help_cmd_holidays": "/holidays — байрамлар джедвели",
         "help_settings_title": "<b>Сазламалар тарифи:</b>",
@@ -487,6 +504,7 @@ TEXTS = {
         "friday": "ДЖУМА",
         "saturday": "Джумаэртеси",
         "sunday": "Базар",
+        "weekdays_short": "Бэ Сл Чр Дк Дж Дэ Бз",
         
         # === Месяцы ===
         "january": "январь",
@@ -549,12 +567,14 @@ TEXTS = {
         "btn_today": "📅 Bugün",
         "btn_tomorrow": "📅 Yarın",
         "btn_next_prayer": "⏰ Nevbetteki namaz",
+        "btn_month": "🗓 Ay",
         "btn_select_date": "📆 Tarihni saylamaq",
         "btn_back": "◀️ Artqa",
         
         # === Расписание ===
         "schedule_title": "📅 <b>Namaz vaqıtları</b>\nKünni saylañız:",
         "schedule_header": "🕌 <b>Namaz vaqıtları</b>",
+        "month_header": "🕌 <b>Namaz vaqıtları — {month} {year}</b>",
         "schedule_not_found": "❌ Bu tarihke cedvel tapılmadı",
         "next_prayer_title": "⏰ <b>Nevbetteki namaz</b>",
         "next_prayer_time": "🕐 Vaqıt:",
@@ -669,6 +689,11 @@ TEXTS = {
         "location_select": "Şeeriñizni saylañız ya da başqa yer belgileñiz:",
         "btn_show_location": "Cedvelde yerni köstermek",
         "btn_other_location": "🏙 Başqa yer",
+        "btn_send_location": "📍 Yerleşüvni yollamaq",
+        "send_location_prompt": "📍 Yerleşüviñizni yollañız (aşağıdaki knopka ya da 📎 → Yerleşüv yardımınen), bot eñ yaqın şeerni saylar",
+        "location_detected": "✅ Eñ yaqın şeer: <b>{name}</b> ({distance} km)\nTüzetüv: <b>{offset:+d} daqqa</b>",
+        "location_by_coords": "✅ Yaqında cedveldeki şeerler yoq, vaqıtlar koordinatalar boyunca esaplandı: <b>{coords}</b>",
+        "location_too_far": "❌ Eñ yaqın bilgen şeer — <b>{name}</b>, {distance} km uzaqlıqta.\nŞeerni cedvelden saylañız ya da tüzetüvni elnen belgileñiz.",
         "location_changed": "✅ Deñiştirildi",
         
         # === Другая локация ===
@@ -721,6 +746,7 @@ TEXTS = {
         "help_cmd_schedule": "/schedule — bugünki cedvel",
         "help_cmd_tomorrow": "/tomorrow — yarınki cedvel",
         "help_cmd_next": "/next — nevbetteki namaz",
+        "help_cmd_month": "/month — aylıq cedvel",
         "help_cmd_settings": "/settings — bot sazlamaları",
         "help_cmd_holidays": "/holidays — bayramlar cedveli",
         "help_settings_title": "<b>Sazlamalar tarifi:</b>",
@@ -753,6 +779,7 @@ TEXTS = {
         "friday": "CUMA",
         "saturday": "Cumaertesi",
         "sunday": "Bazar",
+        "weekdays_short": "Be Sl Çr Dq Cm Ce Bz",
         
         # === Месяцы ===
         "january": "yanvar",
@@ -818,6 +845,11 @@ def get_weekday(lang: str, weekday_index: int) -> str:
     return get_text(lang, weekdays[weekday_index])
 
 
+def get_weekday_short(lang: str, weekday_index: int) -> str:
+    """Получить сокращённое название дня недели (для таблиц)"""
+    return get_text(lang, "weekdays_short").split()[weekday_index]
+
+
 def get_month(lang: str, month: int, header: bool = False) -> str:
     """Получить название месяца"""
     months = [
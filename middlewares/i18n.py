@@ -16,7 +16,7 @@ class I18nMiddleware(BaseMiddleware):
         if not user:
             return await handler(event, data)
 
-        # Получаем настройки из БД
+        # Получаем настройки из БД (через кэш)
         settings = await get_chat_settings(user.id)
         
         # Если настроек нет, создаем (дефолт ru)
@@ -34,4 +34,12 @@ class I18nMiddleware(BaseMiddleware):
         data['lang'] = lang
         data['_'] = _
         
-        return await handler(event, data)
\ No newline at end of file
+        # Настройки уже загружены - отдаём их хендлерам, чтобы не читать повторно.
+        # В группах настройки чата отличаются от настроек пользователя.
+        chat = data.get('event_chat')
+        if settings and (chat is None or chat.id == user.id):
+            data['chat_settings'] = settings
+        else:
+            data['chat_settings'] = None
+        
+        return await handler(event, data)
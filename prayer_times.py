@@ -1,113 +1,565 @@
+import asyncio
 import csv
+import glob
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
 from datetime import datetime, timedelta, date
-from typing import Optional, Dict
+from functools import lru_cache
+from typing import Optional, Dict, List, Tuple, NamedTuple
 import pytz
 from hijri_converter import Hijri, Gregorian
 from config import (
-    CSV_PATH, TIMEZONE, PRAYER_NAMES_STYLES, PRAYER_KEYS,
-    HIJRI_MONTHS, HOLIDAYS, RAMADAN_PERIODS
+    CSV_PATH, TIMETABLE_GLOB, TIMETABLE_BIN_PATH, HIJRI_CALENDAR_PATH, TIMEZONE, PRAYER_NAMES_STYLES, PRAYER_KEYS,
+    HIJRI_MONTHS, HOLIDAYS, RAMADAN_PERIODS, RENDER_CACHE_SIZE, LOCATIONS, COORD_PRECISION
 )
-from locales import get_text, get_weekday, get_month
-
-# Карта начал месяцев Хиджры для 2026 года по календарю ДУМК
-# Ключ: Дата григорианского календаря (начало месяца)
-# Значение: (Месяц Хиджры, Год Хиджры)
-HIJRI_2026_MAP = {
-    date(2025, 12, 21): (7, 1447),   # Реджеб
-    date(2026, 1, 20):  (8, 1447),   # Шабан
-    date(2026, 2, 19):  (9, 1447),   # Рамазан
-    date(2026, 3, 20):  (10, 1447),  # Шевваль
-    date(2026, 4, 19):  (11, 1447),  # Зилькаде
-    date(2026, 5, 18):  (12, 1447),  # Зильхидждже
-    date(2026, 6, 16):  (1, 1448),   # Мухаррем (Новый год)
-    date(2026, 7, 16):  (2, 1448),   # Сефер
-    date(2026, 8, 14):  (3, 1448),   # Ребиуль-эвель
-    date(2026, 9, 13):  (4, 1448),   # Ребиуль-ахыр
-    date(2026, 10, 12): (5, 1448),   # Джумазиель-эвель
-    date(2026, 11, 11): (6, 1448),   # Джумазиель-ахыр
-    date(2026, 12, 10): (7, 1448),   # Реджеб
-}
+from locales import get_text, get_weekday, get_weekday_short, get_month
+
+logger = logging.getLogger(__name__)
+
+MINUTES_PER_DAY = 24 * 60
+PRAYER_COUNT = len(PRAYER_KEYS)
+
+# Месяц хиджры длится не больше 30 дней - граница покрытия после последнего начала месяца
+HIJRI_MAX_MONTH_DAYS = 30
+HIJRI_MIN_MONTH_DAYS = 29
+
+# Бинарный формат расписания (little-endian):
+# заголовок (magic, версия, число столбцов, число строк, SHA-1 исходных CSV),
+# затем uint32[строки] - date.toordinal(), затем uint16[строки * столбцы] - минуты
+TIMETABLE_MAGIC = b"PTTB"
+TIMETABLE_FORMAT_VERSION = 2
+TIMETABLE_HEADER = struct.Struct("<4sHHI20s")
+
+ARABIC_DIGITS = str.maketrans("0123456789", "٠١٢٣٤٥٦٧٨٩")
+
+# Координаты своей локации: (широта, долгота)
+Coords = Tuple[float, float]
+
+
+@lru_cache(maxsize=4096)
+def _gregorian_to_hijri(gregorian_date: date) -> Tuple[int, int, int]:
+    """Алгоритмический перевод даты в хиджру (с мемоизацией)"""
+    hijri = Gregorian(
+        gregorian_date.year,
+        gregorian_date.month,
+        gregorian_date.day
+    ).to_hijri()
+    return hijri.day, hijri.month, hijri.year
+
+def load_hijri_calendar(path: str = HIJRI_CALENDAR_PATH) -> Tuple[Dict[date, Tuple[int, int]], str, int]:
+    """
+    Прочитать файл начал месяцев хиджры.
+    Возвращает (дата начала -> (месяц, год), версия файла, число отброшенных строк).
+    Строка отбрасывается, если она не разбирается или не продолжает предыдущий месяц.
+    """
+    version = ""
+    lines = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('#'):
+                if line[1:].strip().startswith('version:'):
+                    version = line.split(':', 1)[1].strip()
+                continue
+            if line.strip():
+                lines.append(line)
+    
+    parsed = []
+    rejected = 0
+    for row in csv.DictReader(lines):
+        try:
+            start = date.fromisoformat(row['gregorian_start'].strip())
+            month = int(row['hijri_month'])
+            year = int(row['hijri_year'])
+            if not 1 <= month <= 12:
+                raise ValueError(f"hijri_month {month}")
+            parsed.append((start, month, year))
+        except (KeyError, ValueError, AttributeError) as e:
+            rejected += 1
+            logger.warning(f"Hijri calendar: пропущена строка {row}: {e}")
+    
+    month_starts = {}
+    prev = None
+    for start, month, year in sorted(parsed):
+        if prev:
+            prev_start, prev_month, prev_year = prev
+            length = (start - prev_start).days
+            expected = (prev_month % 12 + 1, prev_year + (prev_month == 12))
+            if (month, year) != expected or not HIJRI_MIN_MONTH_DAYS <= length <= HIJRI_MAX_MONTH_DAYS:
+                rejected += 1
+                logger.warning(f"Hijri calendar: месяц {month}/{year} с {start} не продолжает {prev_month}/{prev_year}")
+                continue
+        month_starts[start] = (month, year)
+        prev = (start, month, year)
+    
+    return month_starts, version, rejected
+
+
+def parse_minutes(time_str: str) -> int:
+    """Перевести строку "H:MM" в минуты от полуночи"""
+    hours, minutes = time_str.strip().split(":")
+    hours, minutes = int(hours), int(minutes)
+    if not 0 <= minutes < 60:
+        raise ValueError(f"некорректное время {time_str!r}")
+    return hours * 60 + minutes
+
+
+def format_minutes(minutes: int) -> str:
+    """Перевести минуты от полуночи в строку "HH:MM" (с переходом через сутки)"""
+    hours, minutes = divmod(minutes % MINUTES_PER_DAY, 60)
+    return f"{hours:02d}:{minutes:02d}"
+
+
+class LoadReport(NamedTuple):
+    """Итог загрузки расписания"""
+    files: List[str]
+    loaded: int
+    rejected: int
+    errors: List[str]
+
+
+def timetable_paths() -> List[str]:
+    """Файлы расписания: основной CSV и все годовые файлы по маске"""
+    paths = sorted(set(glob.glob(TIMETABLE_GLOB)) | {CSV_PATH})
+    return paths
+
+
+def sources_digest(paths: List[str]) -> bytes:
+    """SHA-1 имён и содержимого файлов расписания (отсутствующие пропускаются)"""
+    digest = hashlib.sha1()
+    for path in sorted(paths):
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except OSError:
+            continue
+        digest.update(os.path.basename(path).encode())
+        digest.update(len(content).to_bytes(8, 'little'))
+        digest.update(content)
+    return digest.digest()
+
+
+def validate_row(minutes: List[int]):
+    """Проверить строку расписания: времена в пределах суток и идут по порядку"""
+    for key, m in zip(PRAYER_KEYS, minutes):
+        if not 0 <= m < MINUTES_PER_DAY:
+            raise ValueError(f"{key}: время вне суток")
+    for prev, cur, key in zip(minutes, minutes[1:], PRAYER_KEYS[1:]):
+        if cur <= prev:
+            raise ValueError(f"{key}: время не позже предыдущего намаза")
+
+
+def read_timetable_rows(paths: List[str]) -> Tuple[Dict[date, List[int]], LoadReport]:
+    """
+    Прочитать и проверить CSV файлы расписания.
+    Некорректные строки и повторы дат отбрасываются и попадают в отчёт.
+    """
+    rows: Dict[date, List[int]] = {}
+    rejected = 0
+    errors: List[str] = []
+    files: List[str] = []
+    
+    for path in paths:
+        try:
+            f = open(path, 'r', encoding='utf-8')
+        except OSError as e:
+            errors.append(f"{path}: {e}")
+            continue
+        files.append(path)
+        with f:
+            reader = csv.DictReader(f)
+            for line_no, row in enumerate(reader, start=2):
+                try:
+                    d = datetime.strptime(row['date'].strip(), "%Y-%m-%d").date()
+                    minutes = [parse_minutes(row[key]) for key in PRAYER_KEYS]
+                    validate_row(minutes)
+                    if d in rows:
+                        raise ValueError(f"дата {d} уже загружена")
+                    rows[d] = minutes
+                except (KeyError, ValueError, AttributeError, IndexError) as e:
+                    rejected += 1
+                    errors.append(f"{path}:{line_no}: {e}")
+    
+    return rows, LoadReport(files, len(rows), rejected, errors)
+
+
+class TimesBlock(NamedTuple):
+    """Времена за диапазон дат по столбцам: columns[prayer][i] относится к dates[i]"""
+    dates: List[date]
+    columns: Dict[str, List[int]]
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def formatted(self, prayer: str) -> List[str]:
+        """Столбец в виде строк HH:MM"""
+        return [format_minutes(m) for m in self.columns[prayer]]
+
+
+class Timetable:
+    """
+    Компактная таблица времён намазов.
+    Одна строка на дату, один столбец на каждый ключ из PRAYER_KEYS,
+    значения хранятся как минуты от полуночи (uint16).
+    Данные лежат либо в array, либо прямо в memory-mapped файле (без копирования).
+    """
+
+    def __init__(self, ordinals, minutes, source: Optional[mmap.mmap] = None):
+        # ordinals: отсортированные date.toordinal(), minutes: строки подряд
+        self.ordinals = ordinals
+        self.minutes = minutes
+        # mmap должен жить столько же, сколько таблица
+        self._source = source
+        count = len(ordinals)
+        self.first = ordinals[0] if count else 0
+        # Даты без пропусков - индекс строки вычисляется без поиска
+        self.contiguous = count > 0 and ordinals[count - 1] - self.first + 1 == count
+
+    @classmethod
+    def from_rows(cls, rows: Dict[date, List[int]]) -> "Timetable":
+        """Собрать таблицу из словаря дата -> минуты"""
+        dates = sorted(rows)
+        ordinals = array('I', (d.toordinal() for d in dates))
+        minutes = array('H')
+        for d in dates:
+            minutes.extend(rows[d])
+        return cls(ordinals, minutes)
+
+    @classmethod
+    def from_file(cls, path: str) -> "Timetable":
+        """Открыть скомпилированную таблицу через mmap"""
+        if sys.byteorder != "little":
+            raise ValueError("бинарное расписание поддерживается только на little-endian")
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, columns, count, _ = TIMETABLE_HEADER.unpack_from(mapped, 0)
+        if magic != TIMETABLE_MAGIC or version != TIMETABLE_FORMAT_VERSION:
+            raise ValueError(f"{path}: неизвестный формат")
+        if columns != PRAYER_COUNT:
+            raise ValueError(f"{path}: {columns} столбцов, ожидалось {PRAYER_COUNT}")
+        minutes_offset = TIMETABLE_HEADER.size + 4 * count
+        if len(mapped) != minutes_offset + 2 * count * columns:
+            raise ValueError(f"{path}: неверный размер файла")
+        
+        view = memoryview(mapped)
+        ordinals = view[TIMETABLE_HEADER.size:minutes_offset].cast('I')
+        minutes = view[minutes_offset:].cast('H')
+        return cls(ordinals, minutes, mapped)
+
+    def to_file(self, path: str, digest: bytes = b""):
+        """
+        Записать таблицу в бинарный файл (через временный файл и os.replace).
+        digest - sources_digest исходных CSV, по нему бот проверяет, что файл не устарел.
+        """
+        ordinals = array('I', self.ordinals)
+        minutes = array('H', self.minutes)
+        if sys.byteorder != "little":
+            ordinals.byteswap()
+            minutes.byteswap()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(TIMETABLE_HEADER.pack(TIMETABLE_MAGIC, TIMETABLE_FORMAT_VERSION, PRAYER_COUNT, len(ordinals), digest))
+            f.write(ordinals.tobytes())
+            f.write(minutes.tobytes())
+        os.replace(tmp_path, path)
+
+    def __len__(self) -> int:
+        return len(self.ordinals)
+
+    def row_index(self, target_date: date) -> Optional[int]:
+        """Номер строки для даты (или None)"""
+        ordinal = target_date.toordinal()
+        if self.contiguous:
+            i = ordinal - self.first
+            return i if 0 <= i < len(self.ordinals) else None
+        i = bisect_left(self.ordinals, ordinal)
+        if i < len(self.ordinals) and self.ordinals[i] == ordinal:
+            return i
+        return None
+
+    def get_row(self, target_date: date) -> Optional[Tuple[int, ...]]:
+        """Строка таблицы (минуты от полуночи) на дату"""
+        i = self.row_index(target_date)
+        if i is None:
+            return None
+        start = i * PRAYER_COUNT
+        return tuple(self.minutes[start:start + PRAYER_COUNT])
+
+    def row_range(self, start: date, end: date) -> Tuple[int, int]:
+        """Полуинтервал строк [i0, i1) для дат от start до end включительно"""
+        count = len(self.ordinals)
+        lo, hi = start.toordinal(), end.toordinal()
+        if self.contiguous:
+            i0 = min(max(lo - self.first, 0), count)
+            i1 = min(max(hi - self.first + 1, i0), count)
+            return i0, i1
+        return bisect_left(self.ordinals, lo), max(bisect_right(self.ordinals, hi), bisect_left(self.ordinals, lo))
+
+    def column(self, prayer_index: int, i0: int, i1: int):
+        """Столбец намаза для строк [i0, i1) - срез с шагом, без цикла по дням"""
+        return self.minutes[i0 * PRAYER_COUNT + prayer_index:i1 * PRAYER_COUNT:PRAYER_COUNT]
+
+    def shifted(self, offset: int) -> "Timetable":
+        """Копия таблицы со смещением всех времён на offset минут (даты общие)"""
+        if not offset:
+            return self
+        minutes = array('H', ((m + offset) % MINUTES_PER_DAY for m in self.minutes))
+        return Timetable(self.ordinals, minutes, self._source)
+
+
+def settings_coords(settings: Optional[dict]) -> Optional[Coords]:
+    """Координаты из настроек чата (None - расписание CSV со смещением)"""
+    if not settings or settings.get('latitude') is None or settings.get('longitude') is None:
+        return None
+    return settings['latitude'], settings['longitude']
+
+
+def compiled_timetable_is_fresh(bin_path: str = TIMETABLE_BIN_PATH, paths: List[str] = None) -> bool:
+    """
+    Бинарный файл собран из тех же CSV, что лежат сейчас: сверяется хэш содержимого
+    из заголовка (время изменения ненадёжно - восстановленный CSV может быть "старше").
+    """
+    try:
+        with open(bin_path, 'rb') as f:
+            header = f.read(TIMETABLE_HEADER.size)
+        magic, version, _, _, digest = TIMETABLE_HEADER.unpack(header)
+    except (OSError, struct.error):
+        return False
+    if magic != TIMETABLE_MAGIC or version != TIMETABLE_FORMAT_VERSION:
+        return False
+    return digest == sources_digest(paths or timetable_paths())
+
 
 class PrayerTimesManager:
     def __init__(self):
-        self.data: Dict[date, Dict[str, str]] = {}
+        self.timetable = Timetable.from_rows({})
+        # Растёт при каждой подмене таблицы (по нему планировщик понимает, что нужен пересчёт)
+        self.timetable_version = 0
         self.tz = pytz.timezone(TIMEZONE)
+        # Кэш готовых текстов: профиль форматирования -> текст
+        self._render_cache: Dict[tuple, str] = {}
+        self._render_cache_day: Optional[date] = None
+        # Таблицы с уже применённым общим смещением - только для смещений городов из LOCATIONS.
+        # Свои смещения чатов (их сотни) прибавляются к строке базовой таблицы
+        self._pinned_offsets = frozenset(offset for _, offset in LOCATIONS) | {0}
+        self._offset_tables: Dict[int, Timetable] = {}
+        # Индекс начал месяцев хиджры для поиска через bisect
+        self._hijri_starts: List[date] = []
+        self._hijri_months: List[Tuple[int, int]] = []
+        self._hijri_end: Optional[date] = None
+        self.hijri_version = ""
+        self.load_hijri_calendar()
         self.load_data()
     
-    def load_data(self):
-        """Загрузка CSV"""
-        self.data = {}
-        with open(CSV_PATH, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                try:
-                    d = datetime.strptime(row['date'].strip(), "%Y-%m-%d").date()
-                    self.data[d] = {key: row[key].strip() for key in PRAYER_KEYS}
-                except:
-                    pass
-        print(f"Загружено {len(self.data)} дней")
+    def build_timetable(self, paths: List[str] = None) -> Tuple[Optional[Timetable], LoadReport]:
+        """
+        Собрать новую таблицу, не трогая текущую.
+        Возвращает None вместо таблицы, если не загружено ни одной строки.
+        """
+        paths = paths or timetable_paths()
+        
+        # Скомпилированный файл открывается мгновенно и делит страницы между процессами
+        if compiled_timetable_is_fresh(TIMETABLE_BIN_PATH, paths):
+            try:
+                timetable = Timetable.from_file(TIMETABLE_BIN_PATH)
+                return timetable, LoadReport([TIMETABLE_BIN_PATH], len(timetable), 0, [])
+            except (OSError, ValueError, struct.error) as e:
+                logger.warning(f"Не удалось открыть {TIMETABLE_BIN_PATH}, читаем CSV: {e}")
+        
+        rows, report = read_timetable_rows(paths)
+        if not rows:
+            return None, report
+        return Timetable.from_rows(rows), report
+
+    def swap_timetable(self, timetable: Timetable):
+        """Атомарно подменить таблицу (читатели видят либо старую, либо новую)"""
+        offset_tables = {offset: timetable.shifted(offset) for offset in self._pinned_offsets}
+        self.timetable = timetable
+        self._offset_tables = offset_tables
+        self.timetable_version += 1
+        self._render_cache.clear()
+
+    def _apply_load(self, timetable: Optional[Timetable], report: LoadReport) -> LoadReport:
+        for error in report.errors[:20]:
+            logger.warning(f"Расписание: {error}")
+        if timetable is None:
+            logger.error(f"Расписание не загружено ({', '.join(report.files) or 'нет файлов'}), оставлена прежняя таблица")
+            return report
+        self.swap_timetable(timetable)
+        logger.info(
+            f"Загружено {report.loaded} дней из {len(report.files)} файлов, "
+            f"отброшено строк: {report.rejected}"
+        )
+        return report
+
+    def load_data(self) -> LoadReport:
+        """Загрузка CSV в таблицу минут"""
+        return self._apply_load(*self.build_timetable())
+
+    async def reload_data(self) -> LoadReport:
+        """Перезагрузка без блокировки event loop: таблица строится в отдельном потоке"""
+        timetable, report = await asyncio.to_thread(self.build_timetable)
+        return self._apply_load(timetable, report)
     
+    def _offset_table(
+        self,
+        offset: int,
+        coords: Optional[Coords] = None,
+        start: date = None,
+        end: date = None
+    ) -> Tuple[Timetable, int]:
+        """
+        Таблица для общего смещения и остаток смещения, который нужно прибавить к её строкам.
+        Для смещений городов - готовая таблица и 0, для остальных - базовая таблица и само смещение.
+        Для координат - астрономическая таблица только на даты от start до end (astronomy.coords_table).
+        """
+        if coords is not None:
+            # astronomy импортирует этот модуль, поэтому импорт здесь
+            from astronomy import coords_table
+            return coords_table(start, end or start, *coords), offset
+        
+        table = self._offset_tables.get(offset)
+        if table is not None:
+            return table, 0
+        return self.timetable, offset
+
     def get_times_for_date(self, target_date: date) -> Optional[Dict[str, str]]:
         """Получить времена намазов на определённую дату"""
-        return self.data.get(target_date)
+        row = self.timetable.get_row(target_date)
+        if row is None:
+            return None
+        return {key: format_minutes(m) for key, m in zip(PRAYER_KEYS, row)}
     
     def apply_offset(self, time_str: str, offset_minutes: int) -> str:
         """Применить смещение к времени"""
-        time_obj = datetime.strptime(time_str, "%H:%M")
-        time_obj += timedelta(minutes=offset_minutes)
-        return time_obj.strftime("%H:%M")
+        return format_minutes(parse_minutes(time_str) + offset_minutes)
     
-    def get_adjusted_times(
+    def get_adjusted_minutes(
         self,
         target_date: date,
         general_offset: int = 0,
-        prayer_offsets: Dict[str, int] = None
-    ) -> Optional[Dict[str, str]]:
-        """Получить времена с учётом смещений"""
-        times = self.get_times_for_date(target_date)
-        if not times:
+        prayer_offsets: Dict[str, int] = None,
+        coords: Optional[Coords] = None
+    ) -> Optional[List[int]]:
+        """Получить времена с учётом смещений (минуты от полуночи, порядок PRAYER_KEYS)"""
+        # Для смещений городов общее смещение уже применено в таблице
+        timetable, offset = self._offset_table(general_offset, coords, target_date)
+        row = timetable.get_row(target_date)
+        if row is None:
             return None
         
+        if not prayer_offsets and not offset:
+            return list(row)
+        
+        prayer_offsets = prayer_offsets or {}
+        return [
+            (m + offset + prayer_offsets.get(key, 0)) % MINUTES_PER_DAY
+            for key, m in zip(PRAYER_KEYS, row)
+        ]
+    
+    def get_adjusted_range(
+        self,
+        start: date,
+        end: date,
+        general_offset: int = 0,
+        prayer_offsets: Dict[str, int] = None,
+        coords: Optional[Coords] = None
+    ) -> TimesBlock:
+        """
+        Времена с учётом смещений за диапазон дат (включительно) блоком столбцов.
+        Смещение применяется ко всему столбцу сразу, даты без данных пропускаются.
+        """
+        timetable, general_offset = self._offset_table(general_offset, coords, start, end)
+        i0, i1 = timetable.row_range(start, end)
+        dates = [date.fromordinal(o) for o in timetable.ordinals[i0:i1]]
         prayer_offsets = prayer_offsets or {}
         
-        adjusted = {}
-        for prayer, time in times.items():
-            total_offset = general_offset + prayer_offsets.get(prayer, 0)
-            adjusted[prayer] = self.apply_offset(time, total_offset)
+        columns = {}
+        for c, key in enumerate(PRAYER_KEYS):
+            column = timetable.column(c, i0, i1)
+            offset = general_offset + prayer_offsets.get(key, 0)
+            if offset:
+                columns[key] = [(m + offset) % MINUTES_PER_DAY for m in column]
+            else:
+                columns[key] = list(column)
         
-        return adjusted
+        return TimesBlock(dates, columns)
+
+    def get_adjusted_times(
+        self,
+        target_date: date,
+        general_offset: int = 0,
+        prayer_offsets: Dict[str, int] = None,
+        coords: Optional[Coords] = None
+    ) -> Optional[Dict[str, str]]:
+        """Получить времена с учётом смещений"""
+        minutes = self.get_adjusted_minutes(target_date, general_offset, prayer_offsets, coords)
+        if minutes is None:
+            return None
+        return {key: format_minutes(m) for key, m in zip(PRAYER_KEYS, minutes)}
     
+    def build_hijri_index(self, month_starts: Dict[date, Tuple[int, int]]):
+        """Построить отсортированный индекс начал месяцев хиджры"""
+        starts = sorted(month_starts)
+        months = [month_starts[d] for d in starts]
+        end = starts[-1] + timedelta(days=HIJRI_MAX_MONTH_DAYS) if starts else None
+        # Подменяем индекс целиком, чтобы читатели не видели его частично
+        self._hijri_starts, self._hijri_months, self._hijri_end = starts, months, end
+        self._hijri_warned = False
+        self._render_cache.clear()
+
+    def load_hijri_calendar(self, path: str = HIJRI_CALENDAR_PATH) -> int:
+        """(Пере)загрузить календарь хиджры из файла. Возвращает число месяцев."""
+        try:
+            month_starts, version, rejected = load_hijri_calendar(path)
+        except OSError as e:
+            logger.error(f"Не удалось прочитать календарь хиджры {path}: {e}")
+            return len(self._hijri_starts)
+        
+        self.build_hijri_index(month_starts)
+        self.hijri_version = version
+        logger.info(
+            f"Календарь хиджры {version or '?'}: {len(month_starts)} месяцев "
+            f"(до {self._hijri_end}), отброшено строк: {rejected}"
+        )
+        return len(month_starts)
+
+    @property
+    def hijri_covered_until(self) -> Optional[date]:
+        """Первая дата, для которой календаря ДУМК уже нет"""
+        return self._hijri_end
+
     def _get_hijri_date_algo(self, gregorian_date: date) -> tuple:
         """Старый метод (алгоритмический расчет)"""
-        hijri = Gregorian(
-            gregorian_date.year,
-            gregorian_date.month,
-            gregorian_date.day
-        ).to_hijri()
-        return hijri.day, hijri.month, hijri.year
+        return _gregorian_to_hijri(gregorian_date)
 
     def get_hijri_date(self, gregorian_date: date) -> tuple:
-        """Получить дату по хиджри (сначала пробуем карту 2026, потом алгоритм)"""
-        
-        # Пытаемся найти в карте
-        if gregorian_date.year == 2026 or (gregorian_date.year == 2025 and gregorian_date.month == 12):
-            # Сортируем даты начала месяцев в обратном порядке
-            sorted_starts = sorted(HIJRI_2026_MAP.keys(), reverse=True)
-            
-            for start_date in sorted_starts:
-                if gregorian_date >= start_date:
-                    h_month, h_year = HIJRI_2026_MAP[start_date]
-                    # Разница в днях + 1 (так как первый день это 1-е число)
-                    h_day = (gregorian_date - start_date).days + 1
-                    return h_day, h_month, h_year
-
-        # Если даты нет в карте, используем старую функцию
+        """Получить дату по хиджри (сначала по индексу месяцев ДУМК, потом алгоритм)"""
+        if self._hijri_end and gregorian_date < self._hijri_end:
+            i = bisect_right(self._hijri_starts, gregorian_date) - 1
+            if i >= 0:
+                h_month, h_year = self._hijri_months[i]
+                # Разница в днях + 1 (так как первый день это 1-е число)
+                h_day = (gregorian_date - self._hijri_starts[i]).days + 1
+                return h_day, h_month, h_year
+
+        # Если даты нет в индексе, используем алгоритм
+        if self._hijri_end and gregorian_date >= self._hijri_end and not self._hijri_warned:
+            self._hijri_warned = True
+            logger.warning(
+                f"Календарь хиджры ({HIJRI_CALENDAR_PATH}) заканчивается {self._hijri_end}, "
+                f"для {gregorian_date} используется алгоритмический расчёт"
+            )
         return self._get_hijri_date_algo(gregorian_date)
 
     def _to_arabic_numerals(self, number: int) -> str:
         """Преобразование чисел в восточно-арабские цифры (٠-٩)"""
-        table = str.maketrans("0123456789", "٠١٢٣٤٥٦٧٨٩")
-        return str(number).translate(table)
+        return str(number).translate(ARABIC_DIGITS)
     
     def format_hijri_date(self, gregorian_date: date, style: str = "translit", lang: str = "ru") -> str:
         """Форматировать дату хиджри"""
@@ -173,6 +625,40 @@ class PrayerTimesManager:
         
         return None
     
+    def schedule_profile(
+        self,
+        target_date: date,
+        general_offset: int = 0,
+        prayer_offsets: Dict[str, int] = None,
+        location_name: str = "Симферополь",
+        enabled_prayers: list = None,
+        show_location: bool = True,
+        prayer_names_style: str = "standard",
+        show_hijri: bool = True,
+        hijri_style: str = "translit",
+        show_holidays: bool = True,
+        lang: str = "ru",
+        coords: Optional[Coords] = None
+    ) -> tuple:
+        """
+        Нормализованный профиль форматирования расписания.
+        Одинаковый профиль даёт одинаковый текст, поэтому он служит ключом кэша.
+        """
+        enabled_prayers = enabled_prayers or PRAYER_KEYS
+        return (
+            target_date,
+            general_offset,
+            tuple(sorted((k, v) for k, v in (prayer_offsets or {}).items() if v)),
+            tuple(p for p in PRAYER_KEYS if p in enabled_prayers),
+            location_name if show_location and location_name else None,
+            prayer_names_style,
+            hijri_style if show_hijri else None,
+            bool(show_hijri),
+            bool(show_holidays),
+            lang,
+            tuple(round(c, COORD_PRECISION) for c in coords) if coords else None,
+        )
+
     def format_schedule(
         self,
         target_date: date,
@@ -185,10 +671,155 @@ class PrayerTimesManager:
         show_hijri: bool = True,
         hijri_style: str = "translit",
         show_holidays: bool = True,
-        lang: str = "ru"
+        lang: str = "ru",
+        coords: Optional[Coords] = None
     ) -> str:
-        """Форматированный вывод расписания"""
-        times = self.get_adjusted_times(target_date, general_offset, prayer_offsets)
+        """Форматированный вывод расписания (с кэшированием по профилю)"""
+        key = self.schedule_profile(
+            target_date, general_offset, prayer_offsets, location_name,
+            enabled_prayers, show_location, prayer_names_style,
+            show_hijri, hijri_style, show_holidays, lang, coords
+        )
+        return self._cached_render(
+            key, self._render_schedule,
+            target_date, general_offset, prayer_offsets, location_name,
+            enabled_prayers, show_location, prayer_names_style,
+            show_hijri, hijri_style, show_holidays, lang, coords
+        )
+
+    def format_month(
+        self,
+        year: int,
+        month: int,
+        general_offset: int = 0,
+        prayer_offsets: Dict[str, int] = None,
+        location_name: str = "Симферополь",
+        enabled_prayers: list = None,
+        show_location: bool = True,
+        prayer_names_style: str = "standard",
+        show_hijri: bool = True,
+        hijri_style: str = "translit",
+        show_holidays: bool = True,
+        lang: str = "ru",
+        coords: Optional[Coords] = None
+    ) -> str:
+        """Таблица времён на весь месяц (с кэшированием по месяцу и профилю)"""
+        key = ("month",) + self.schedule_profile(
+            date(year, month, 1), general_offset, prayer_offsets, location_name,
+            enabled_prayers, show_location, prayer_names_style,
+            show_hijri, hijri_style, show_holidays, lang, coords
+        )
+        return self._cached_render(
+            key, self._render_month,
+            year, month, general_offset, prayer_offsets, location_name,
+            enabled_prayers, show_location, prayer_names_style,
+            show_hijri, hijri_style, show_holidays, lang, coords
+        )
+
+    def _cached_render(self, key: tuple, render, *args) -> str:
+        """Взять текст из кэша или собрать его через render(*args)"""
+        today = datetime.now(self.tz).date()
+        if today != self._render_cache_day:
+            # Новый день - старые тексты больше не понадобятся
+            self._render_cache.clear()
+            self._render_cache_day = today
+        
+        text = self._render_cache.get(key)
+        if text is None:
+            text = render(*args)
+            if len(self._render_cache) >= RENDER_CACHE_SIZE:
+                # Вытесняем самую старую запись
+                del self._render_cache[next(iter(self._render_cache))]
+            self._render_cache[key] = text
+        return text
+
+    def _render_month(
+        self,
+        year: int,
+        month: int,
+        general_offset: int = 0,
+        prayer_offsets: Dict[str, int] = None,
+        location_name: str = "Симферополь",
+        enabled_prayers: list = None,
+        show_location: bool = True,
+        prayer_names_style: str = "standard",
+        show_hijri: bool = True,
+        hijri_style: str = "translit",
+        show_holidays: bool = True,
+        lang: str = "ru",
+        coords: Optional[Coords] = None
+    ) -> str:
+        """Сборка таблицы на месяц одним запросом диапазона"""
+        first_day = date(year, month, 1)
+        last_day = (first_day + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+        block = self.get_adjusted_range(first_day, last_day, general_offset, prayer_offsets, coords)
+        
+        if not block:
+            return get_text(lang, "schedule_not_found")
+        
+        enabled = [p for p in PRAYER_KEYS if p in (enabled_prayers or PRAYER_KEYS)]
+        prayer_names = PRAYER_NAMES_STYLES.get(prayer_names_style, PRAYER_NAMES_STYLES["standard"])
+        columns = [block.formatted(p) for p in enabled]
+        
+        text = get_text(lang, "month_header", month=get_month(lang, month, header=True), year=year) + "\n"
+        
+        if show_location and location_name:
+            text += f"📍 {location_name}\n"
+        
+        if show_hijri:
+            first_hijri = self.format_hijri_date(block.dates[0], hijri_style, lang)
+            last_hijri = self.format_hijri_date(block.dates[-1], hijri_style, lang)
+            text += f"🗓 \u200e{first_hijri} — \u200e{last_hijri}\n"
+        
+        # Моноширинная таблица: день, день недели, по столбцу на намаз
+        labels = [prayer_names[p].split(" ", 1)[-1][:3] for p in enabled]
+        lines = [("      " + " ".join(label.ljust(5) for label in labels)).rstrip()]
+        holidays = []
+        for i, d in enumerate(block.dates):
+            mark = " "
+            if show_holidays:
+                holiday = self.get_holiday(d)
+                if holiday:
+                    mark = "*"
+                    holidays.append(f"{d.day} — {holiday['name']}")
+            times = " ".join(column[i] for column in columns)
+            lines.append(f"{d.day:2d}{mark}{get_weekday_short(lang, d.weekday())} {times}")
+        
+        text += "<pre>" + "\n".join(lines) + "</pre>\n"
+        
+        if holidays:
+            text += "\n" + "\n".join(f"* {h}" for h in holidays) + "\n"
+        
+        has_prayer_offsets = bool(prayer_offsets and any(v != 0 for v in prayer_offsets.values()))
+        if general_offset != 0 or has_prayer_offsets:
+            text += "\n"
+            if general_offset != 0:
+                sign = "+" if general_offset > 0 else ""
+                text += get_text(lang, "time_adjusted", offset=f"{sign}{general_offset}")
+            if has_prayer_offsets:
+                if general_offset != 0:
+                    text += "\n"
+                text += get_text(lang, "individual_offsets_applied")
+        
+        return text
+
+    def _render_schedule(
+        self,
+        target_date: date,
+        general_offset: int = 0,
+        prayer_offsets: Dict[str, int] = None,
+        location_name: str = "Симферополь",
+        enabled_prayers: list = None,
+        show_location: bool = True,
+        prayer_names_style: str = "standard",
+        show_hijri: bool = True,
+        hijri_style: str = "translit",
+        show_holidays: bool = True,
+        lang: str = "ru",
+        coords: Optional[Coords] = None
+    ) -> str:
+        """Сборка текста расписания"""
+        times = self.get_adjusted_times(target_date, general_offset, prayer_offsets, coords)
         
         if not times:
             return get_text(lang, "schedule_not_found")
@@ -283,25 +914,26 @@ class PrayerTimesManager:
     def get_next_prayer(
         self,
         general_offset: int = 0,
-        prayer_offsets: Dict[str, int] = None
+        prayer_offsets: Dict[str, int] = None,
+        coords: Optional[Coords] = None
     ) -> Optional[tuple]:
         """Получить следующий намаз"""
         now = datetime.now(self.tz)
         today = now.date()
-        current_time = now.strftime("%H:%M")
+        current_minutes = now.hour * 60 + now.minute
         
-        times = self.get_adjusted_times(today, general_offset, prayer_offsets)
-        if not times:
+        minutes = self.get_adjusted_minutes(today, general_offset, prayer_offsets, coords)
+        if minutes is None:
             return None
         
-        for prayer in PRAYER_KEYS:
-            if times[prayer] > current_time:
-                return (prayer, times[prayer], today)
+        for prayer, m in zip(PRAYER_KEYS, minutes):
+            if m > current_minutes:
+                return (prayer, format_minutes(m), today)
         
         tomorrow = today + timedelta(days=1)
-        times = self.get_adjusted_times(tomorrow, general_offset, prayer_offsets)
-        if times:
-            return (PRAYER_KEYS[0], times[PRAYER_KEYS[0]], tomorrow)
+        minutes = self.get_adjusted_minutes(tomorrow, general_offset, prayer_offsets, coords)
+        if minutes is not None:
+            return (PRAYER_KEYS[0], format_minutes(minutes[0]), tomorrow)
         
         return None
 
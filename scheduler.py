@@ -1,24 +1,184 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from datetime import datetime, timedelta
+from apscheduler.triggers.interval import IntervalTrigger
+from datetime import datetime, timedelta, date, time
+from itertools import groupby
+from typing import Dict, List, Optional, Set, Tuple, Iterable
 import pytz
 import asyncio
 from aiogram import Bot
-from database import get_chats_with_daily_schedule, get_chats_with_reminders
-from prayer_times import prayer_manager
-from config import TIMEZONE, PRAYER_NAMES_STYLES
-from broadcaster import send_safe_message 
+from database import (
+    get_chats_due_daily_schedule, get_chats_with_reminders,
+    get_chat_settings, add_settings_listener,
+    get_changed_chat_ids, invalidate_settings_cache,
+    claim_deliveries, prune_delivery_journal, delivery_journal, PROCESS_OWNER
+)
+from prayer_times import prayer_manager, format_minutes, settings_coords, MINUTES_PER_DAY
+from config import (
+    TIMEZONE, PRAYER_NAMES_STYLES, PRAYER_KEYS, SHARD_RENEW_INTERVAL, STATS_LOG_INTERVAL,
+    DELIVERY_GRACE_MINUTES, DELIVERY_JOURNAL_DAYS, CATCH_UP_MAX_MINUTES, REMINDER_SPREAD
+)
+from broadcaster import Broadcaster
+from sharding import ShardLease
+from timer_wheel import TimerWheel, TimerHandle
 from locales import get_text
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Поля настроек, от которых зависят время и текст напоминаний
+REMINDER_FIELDS = {
+    'reminders', 'time_offset', 'prayer_offsets',
+    'prayer_names_style', 'language', 'is_active',
+    'latitude', 'longitude'
+}
+
+# Запись плана: (chat_id, prayer_key, prayer_time, minutes_before, prayer_names_style, lang)
+ReminderEntry = Tuple[int, str, str, int, str, str]
+
+
+def reminder_spread(chat_id: int) -> float:
+    """Сдвиг напоминаний чата внутри минуты, сек (постоянный, чтобы не менять порядок сообщений)"""
+    return (chat_id * 2654435761) % 2 ** 32 / 2 ** 32 * REMINDER_SPREAD
+
+
+def delivery_target(day: date, minute: int) -> str:
+    """Момент отправки по расписанию для журнала: "YYYY-MM-DDTHH:MM" (местное время)"""
+    return f"{day.isoformat()}T{format_minutes(minute)}"
+
+
+class ReminderPlanner:
+    """
+    План напоминаний на день: минута суток -> напоминания, которые нужно отправить.
+    Строится раз в сутки и точечно пересчитывается для чатов, у которых
+    изменились настройки, поэтому каждая проверка забирает только то,
+    что должно уйти в ближайшую минуту.
+    """
+
+    def __init__(self):
+        self.plan_date: Optional[date] = None
+        self.timetable_version = -1
+        # Фильтр шардов, для которого построен план (None - все чаты)
+        self.shards = None
+        self.buckets: Dict[int, List[ReminderEntry]] = {}
+        self.chat_minutes: Dict[int, Set[int]] = {}
+        self.dirty_chats: Set[int] = set()
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self.buckets.values())
+
+    def on_settings_changed(self, chat_id: int, fields: Iterable[str]):
+        """Пометить чат для пересчёта (вызывается из database.save_chat_settings)"""
+        if REMINDER_FIELDS.intersection(fields):
+            self.dirty_chats.add(chat_id)
+
+    def rebuild(self, target_date: date, chats: list, from_minute: int = 0, shards=None):
+        """Построить план на дату для всех чатов с напоминаниями"""
+        self.plan_date = target_date
+        self.timetable_version = prayer_manager.timetable_version
+        self.shards = shards
+        self.buckets = {}
+        self.chat_minutes = {}
+        for chat in chats:
+            self.add_chat(chat, from_minute)
+
+    def add_chat(self, chat: dict, from_minute: int = 0):
+        """Добавить напоминания чата, которые сработают не раньше from_minute"""
+        reminders = chat.get('reminders') or {}
+        if not reminders or not chat.get('is_active', 1):
+            return
+        
+        minutes = prayer_manager.get_adjusted_minutes(
+            self.plan_date,
+            chat.get('time_offset', 0),
+            chat.get('prayer_offsets', {}),
+            settings_coords(chat)
+        )
+        if minutes is None:
+            return
+        
+        times = dict(zip(PRAYER_KEYS, minutes))
+        chat_id = chat['chat_id']
+        prayer_names_style = chat.get('prayer_names_style', 'standard')
+        lang = chat.get('language', 'ru')
+        
+        for prayer_key, reminder_minutes in reminders.items():
+            prayer_minute = times.get(prayer_key)
+            if prayer_minute is None:
+                continue
+            
+            fire_minute = (prayer_minute - reminder_minutes) % MINUTES_PER_DAY
+            if fire_minute < from_minute:
+                continue
+            
+            self.buckets.setdefault(fire_minute, []).append((
+                chat_id, prayer_key, format_minutes(prayer_minute),
+                reminder_minutes, prayer_names_style, lang
+            ))
+            self.chat_minutes.setdefault(chat_id, set()).add(fire_minute)
+
+    def remove_chat(self, chat_id: int):
+        """Убрать все запланированные напоминания чата"""
+        for minute in self.chat_minutes.pop(chat_id, ()):
+            entries = self.buckets.get(minute)
+            if not entries:
+                continue
+            entries = [entry for entry in entries if entry[0] != chat_id]
+            if entries:
+                self.buckets[minute] = entries
+            else:
+                del self.buckets[minute]
+
+    def restore(self, minute: int, entries: List[ReminderEntry]):
+        """Вернуть забранные напоминания в план (отправка минуты не удалась)"""
+        if not entries:
+            return
+        self.buckets[minute] = entries + self.buckets.get(minute, [])
+        for entry in entries:
+            self.chat_minutes.setdefault(entry[0], set()).add(minute)
+
+    def pop_due(self, minute: int) -> List[ReminderEntry]:
+        """Забрать напоминания, которые нужно отправить в эту минуту"""
+        entries = self.buckets.pop(minute, [])
+        for entry in entries:
+            chat_minutes = self.chat_minutes.get(entry[0])
+            if chat_minutes:
+                chat_minutes.discard(minute)
+        return entries
+
 
 class PrayerScheduler:
-    def __init__(self, bot: Bot):
+    def __init__(self, bot: Bot, broadcaster: Broadcaster, lease: Optional[ShardLease] = None):
         self.bot = bot
-        self.scheduler = AsyncIOScheduler(timezone=TIMEZONE)
+        self.broadcaster = broadcaster
+        # В шардированном режиме процесс обслуживает только чаты своих шардов
+        self.lease = lease
+        # От чьего имени отправки занимаются в журнале
+        self.owner = lease.owner if lease else PROCESS_OWNER
+        self._changes_since: Optional[str] = None
+        # Опоздавшие запуски не теряются и не накапливаются: один запуск
+        # сам обрабатывает все минуты с прошлого тика (см. _due_moments)
+        self.scheduler = AsyncIOScheduler(
+            timezone=TIMEZONE,
+            job_defaults={'coalesce': True, 'max_instances': 1, 'misfire_grace_time': None}
+        )
         self.tz = pytz.timezone(TIMEZONE)
+        self.reminder_planner = ReminderPlanner()
+        # Статистика рассылки расписаний: получатели и уникальные тексты
+        self.daily_stats = {'recipients': 0, 'groups': 0}
+        # Последняя обработанная минута каждого тика (местное время без tzinfo)
+        self._last_tick: Dict[str, datetime] = {}
+        # Отправки позже своей минуты, минуты из опоздавших тиков и отброшенные минуты
+        self.delivery_stats = {'late': 0, 'caught_up_minutes': 0, 'skipped_minutes': 0}
+        # Напоминания ждут своего момента на колесе таймеров, а не минутного тика
+        self.wheel = TimerWheel()
+        # Взведённые напоминания по ключу журнала (ключ уже занят этим процессом)
+        self._armed: Dict[tuple, TimerHandle] = {}
+        # Ключи отменённых при пересчёте напоминаний: заняты этим процессом, но не взведены
+        # (хранятся только ключи, без таймеров, до смены дня)
+        self._disarmed: Set[tuple] = set()
+        self._sending: Set[asyncio.Task] = set()
+        add_settings_listener(self.reminder_planner.on_settings_changed)
     
     def start(self):
         """Запуск планировщика"""
@@ -38,51 +198,230 @@ class PrayerScheduler:
             replace_existing=True
         )
         
+        if self.lease:
+            # Аренда шардов: сразу при запуске и дальше с периодом SHARD_RENEW_INTERVAL.
+            # Пропущенное досылается, когда процесс получает шарды
+            self.scheduler.add_job(
+                self.renew_lease,
+                IntervalTrigger(seconds=SHARD_RENEW_INTERVAL),
+                id='shard_lease',
+                next_run_time=datetime.now(self.tz),
+                replace_existing=True
+            )
+        else:
+            # Досылка того, что не ушло до перезапуска
+            self.scheduler.add_job(self.resume_missed, id='resume_missed')
+        
+        # Статистика рассылки (задержка напоминаний p50/p99) в логе и во время работы
+        self.scheduler.add_job(
+            self.log_stats,
+            IntervalTrigger(seconds=STATS_LOG_INTERVAL),
+            id='stats',
+            replace_existing=True
+        )
+        
         self.scheduler.start()
         logger.info("Планировщик запущен")
     
+    def log_stats(self):
+        """Периодическая сводка рассылки"""
+        if not self.broadcaster.sent and not self.broadcaster.failed and not self.broadcaster.queue.qsize():
+            return
+        logger.info(
+            f"Рассылка: {self.broadcaster.stats()}; "
+            f"взведено напоминаний {len(self._armed)}, с опозданием отправлено {self.delivery_stats['late']}"
+        )
+    
     def stop(self):
         self.scheduler.shutdown()
-        logger.info("Планировщик остановлен")
+        # Невзведённые напоминания останутся в журнале как 'pending' и будут досланы после запуска
+        self.wheel.stop()
+        logger.info(
+            f"Планировщик остановлен: с опозданием отправлено {self.delivery_stats['late']}, "
+            f"догнано минут {self.delivery_stats['caught_up_minutes']}, "
+            f"пропущено минут {self.delivery_stats['skipped_minutes']}"
+        )
+    
+    @property
+    def shard_filter(self):
+        """Фильтр шардов для запросов (None - все чаты)"""
+        return self.lease.filter if self.lease else None
+    
+    async def renew_lease(self):
+        """Продление аренды шардов"""
+        before = self.lease.shards
+        try:
+            shards = await self.lease.renew()
+        except Exception as e:
+            # Если не продлить до истечения TTL, lease.shards станет пустым
+            logger.error(f"Не удалось продлить аренду шардов: {e}")
+            return
+        if before - shards:
+            self._disarm_foreign()
+        if shards - before:
+            # Новые шарды могли остаться от упавшего процесса
+            await self.resume_missed()
+    
+    async def resume_missed(self):
+        """
+        Досылка отправок за последние DELIVERY_GRACE_MINUTES минут,
+        которых нет в журнале или которые не подтверждены (процесс упал посреди рассылки).
+        """
+        # Статусы уже отправленного должны попасть в БД, иначе они ещё 'pending'
+        await delivery_journal.flush()
+        
+        now = self._local_now()
+        today = now.date()
+        current_minute = now.hour * 60 + now.minute
+        start = max(0, current_minute - DELIVERY_GRACE_MINUTES)
+        
+        resumed = await self.dispatch_daily(today, range(start, current_minute), resume=True, late=True)
+        resumed += await self.dispatch_daily(today, [current_minute], resume=True)
+        
+        # План напоминаний с начала окна: уже отправленное отсеет журнал
+        planner = self.reminder_planner
+        planner.dirty_chats.clear()
+        chats = await get_chats_with_reminders(self.shard_filter)
+        planner.rebuild(today, chats, start, self.shard_filter)
+        for minute in range(start, min(current_minute + 2, MINUTES_PER_DAY)):
+            resumed += await self.dispatch_reminders(
+                today, minute, planner.pop_due(minute),
+                resume=True, late=minute < current_minute
+            )
+        
+        # Следующие тики продолжают с текущей минуты
+        current = now.replace(second=0, microsecond=0)
+        self._last_tick['daily'] = current
+        self._last_tick['reminders'] = current
+        
+        if resumed:
+            logger.info(f"Дослано после перезапуска: {resumed} сообщений")
+    
+    async def _mark_changed_chats(self):
+        """Найти чаты, изменённые другими процессами, и пометить их для пересчёта"""
+        chat_ids, self._changes_since = await get_changed_chat_ids(self._changes_since)
+        for chat_id in chat_ids:
+            if self.lease.owns(chat_id):
+                invalidate_settings_cache(chat_id)
+                self.reminder_planner.dirty_chats.add(chat_id)
+    
+    def _local_now(self) -> datetime:
+        """Текущее местное время без tzinfo (для арифметики по минутам)"""
+        return datetime.now(self.tz).replace(tzinfo=None)
+    
+    def _due_moments(self, job: str, now: datetime) -> List[datetime]:
+        """
+        Минуты, которые должен обработать тик: с последней обработанной (не включая)
+        по текущую. Обычно это одна текущая минута; если тик опоздал или предыдущий
+        не запустился, пропущенные минуты догоняются, но не больше CATCH_UP_MAX_MINUTES.
+        Минута считается обработанной только после успешной отправки (_last_tick
+        сдвигает вызывающий), так что минуты упавшего тика повторит следующий.
+        """
+        current = now.replace(second=0, microsecond=0)
+        last = self._last_tick.get(job)
+        
+        if last is None or last > current:
+            # Первый тик или часы перевели назад - только текущая минута
+            # (отсчёт с предыдущей, чтобы упавший тик повторился)
+            self._last_tick[job] = current - timedelta(minutes=1)
+            return [current]
+        if last == current:
+            return []
+        
+        first = max(last + timedelta(minutes=1), current - timedelta(minutes=CATCH_UP_MAX_MINUTES - 1))
+        skipped = int((first - last).total_seconds()) // 60 - 1
+        if skipped > 0:
+            self.delivery_stats['skipped_minutes'] += skipped
+            logger.error(f"Тик {job}: пропущено {skipped} мин (больше CATCH_UP_MAX_MINUTES)")
+        
+        count = int((current - first).total_seconds()) // 60 + 1
+        if count > 1:
+            self.delivery_stats['caught_up_minutes'] += count - 1
+            logger.warning(f"Тик {job} опоздал: догоняем {count - 1} мин")
+        return [first + timedelta(minutes=i) for i in range(count)]
     
     async def check_daily_schedules(self):
-        """Проверка и отправка ежедневных расписаний"""
-        now = datetime.now(self.tz)
-        current_time = now.strftime("%H:%M")
+        """Проверка и отправка ежедневных расписаний (с догоном пропущенных минут)"""
+        moments = self._due_moments('daily', self._local_now())
+        if not moments:
+            return
+        
+        current = moments[-1]
+        late = moments[:-1]
+        # Пропущенные минуты - одним запросом на каждый день
+        for day, day_moments in groupby(late, key=lambda moment: moment.date()):
+            day_moments = list(day_moments)
+            minutes = [moment.hour * 60 + moment.minute for moment in day_moments]
+            await self.dispatch_daily(day, minutes, late=True)
+            self._last_tick['daily'] = day_moments[-1]
+        await self.dispatch_daily(current.date(), [current.hour * 60 + current.minute])
+        self._last_tick['daily'] = current
+
+    async def dispatch_daily(
+        self,
+        today: date,
+        minutes: Iterable[int],
+        resume: bool = False,
+        late: bool = False
+    ) -> int:
+        """Рассылка ежедневных расписаний, назначенных на минуты minutes"""
+        targets = {format_minutes(minute): delivery_target(today, minute) for minute in minutes}
+        
+        # Берём из БД только тех, кому нужно отправить в эти минуты
+        target_chats = await get_chats_due_daily_schedule(targets, self.shard_filter)
         
-        chats = await get_chats_with_daily_schedule()
+        if not target_chats:
+            return 0
         
-        # Фильтруем тех, кому нужно отправить прямо сейчас
-        target_chats = [chat for chat in chats if chat.get('daily_schedule_time') == current_time]
+        # Отсеиваем уже отправленное (журнал переживает перезапуск)
+        keys = {
+            chat['chat_id']: (chat['chat_id'], 'daily', targets[chat['daily_schedule_time']])
+            for chat in target_chats
+        }
+        claimed = await claim_deliveries(keys.values(), include_pending=resume, owner=self.owner)
+        target_chats = [chat for chat in target_chats if keys[chat['chat_id']] in claimed]
         
         if not target_chats:
-            return
+            return 0
+        if late:
+            self.delivery_stats['late'] += len(target_chats)
 
         logger.info(f"Начинаем рассылку расписания для {len(target_chats)} чатов")
         
-        # Запускаем рассылку в цикле
-        count = 0
+        # Группируем чаты по профилю форматирования: один текст на группу
+        groups: Dict[tuple, List[int]] = {}
+        group_params: Dict[tuple, dict] = {}
         for chat in target_chats:
-            asyncio.create_task(self.process_daily_schedule_sending(chat))
-            # Небольшая пауза, чтобы не убить API Telegram (примерно 20 сообщений в секунду)
-            await asyncio.sleep(0.05) 
-            count += 1
-            
-        logger.info(f"Задачи на рассылку созданы для {count} чатов")
-
-    async def process_daily_schedule_sending(self, chat_settings: dict):
-        """Подготовка данных и вызов безопасной отправки"""
-        chat_id = chat_settings['chat_id']
-        lang = chat_settings.get('language', 'ru')
+            params = self.schedule_params(chat, today)
+            profile = prayer_manager.schedule_profile(**params)
+            if profile not in groups:
+                groups[profile] = []
+                group_params[profile] = params
+            groups[profile].append(chat['chat_id'])
+        
+        # Ставим сообщения в очередь, скорость отправки регулирует Broadcaster
+        for profile, chat_ids in groups.items():
+            text = prayer_manager.format_schedule(**group_params[profile])
+            for chat_id in chat_ids:
+                await self.broadcaster.submit(chat_id, text, key=keys[chat_id])
         
-        # Определяем дату
-        today = datetime.now(self.tz).date()
+        self.daily_stats['recipients'] += len(target_chats)
+        self.daily_stats['groups'] += len(groups)
+        logger.info(
+            f"В очередь рассылки поставлено {len(target_chats)} сообщений, "
+            f"уникальных текстов: {len(groups)} "
+            f"(дедупликация x{len(target_chats) / len(groups):.1f})"
+        )
+        return len(target_chats)
+
+    def schedule_params(self, chat_settings: dict, today: date) -> dict:
+        """Параметры format_schedule для чата (с учётом дня: сегодня/завтра)"""
         if chat_settings.get('schedule_day') == 'tomorrow':
             target_date = today + timedelta(days=1)
         else:
             target_date = today
         
-        text = prayer_manager.format_schedule(
+        return dict(
             target_date=target_date,
             general_offset=chat_settings.get('time_offset', 0),
             prayer_offsets=chat_settings.get('prayer_offsets', {}),
@@ -93,68 +432,155 @@ class PrayerScheduler:
             show_hijri=bool(chat_settings.get('show_hijri', 1)),
             hijri_style=chat_settings.get('hijri_style', 'translit'),
             show_holidays=bool(chat_settings.get('show_holidays', 1)),
-            lang=lang
+            lang=chat_settings.get('language', 'ru'),
+            coords=settings_coords(chat_settings)
         )
-        
-        # Используем безопасную отправку
-        await send_safe_message(self.bot, chat_id, text)
 
     async def check_reminders(self):
-        """Проверка и отправка напоминаний"""
-        now = datetime.now(self.tz)
+        """Отправка напоминаний, запланированных на текущую минуту (с догоном пропущенных)"""
+        now = self._local_now()
         today = now.date()
+        planner = self.reminder_planner
+        shards = self.shard_filter
         
-        chats = await get_chats_with_reminders()
+        if self.lease:
+            # Настройки меняет другой процесс - его оповещения сюда не доходят
+            await self._mark_changed_chats()
         
-        for chat in chats:
-            await self.process_single_chat_reminder(chat, now, today)
-
-    async def process_single_chat_reminder(self, chat: dict, now: datetime, today):
-        """Логика проверки одного чата для напоминаний"""
-        reminders = chat.get('reminders', {})
-        if not reminders:
+        moments = self._due_moments('reminders', now)
+        if not moments:
             return
         
-        times = prayer_manager.get_adjusted_times(
-            today,
-            chat.get('time_offset', 0),
-            chat.get('prayer_offsets', {})
-        )
+        # Хвост прошлых суток забираем из старого плана, пока он не перестроен
+        for moment in moments:
+            if moment.date() == today:
+                break
+            if moment.date() == planner.plan_date:
+                await self._dispatch_planned(moment.date(), moment.hour * 60 + moment.minute, late=True)
+            self._last_tick['reminders'] = moment
+        
+        today_moments = [moment for moment in moments if moment.date() == today]
+        from_minute = today_moments[0].hour * 60 + today_moments[0].minute
+        current_minute = today_moments[-1].hour * 60 + today_moments[-1].minute
+        
+        if (
+            planner.plan_date != today
+            or planner.timetable_version != prayer_manager.timetable_version
+            or planner.shards != shards
+        ):
+            # Новый день, перезагружено расписание или сменились шарды - строим план заново
+            if planner.shards != shards:
+                self._disarm_foreign()
+            if planner.plan_date != today:
+                await prune_delivery_journal(delivery_target(today - timedelta(days=DELIVERY_JOURNAL_DAYS), 0))
+                self._disarmed.clear()
+            planner.dirty_chats.clear()
+            chats = await get_chats_with_reminders(shards)
+            planner.rebuild(today, chats, from_minute, shards)
+            logger.info(f"План напоминаний на {today}: {len(planner)} шт.")
+        else:
+            # Пересчитываем только чаты, у которых изменились настройки
+            while planner.dirty_chats:
+                chat_id = planner.dirty_chats.pop()
+                planner.remove_chat(chat_id)
+                self._disarm_chat(chat_id)
+                if self.lease and not self.lease.owns(chat_id):
+                    continue
+                try:
+                    chat = await get_chat_settings(chat_id)
+                except Exception:
+                    # Пересчитаем на следующем тике
+                    planner.dirty_chats.add(chat_id)
+                    raise
+                if chat:
+                    planner.add_chat(chat, from_minute)
+        
+        for moment in today_moments:
+            minute = moment.hour * 60 + moment.minute
+            await self._dispatch_planned(today, minute, late=minute != current_minute)
+            self._last_tick['reminders'] = moment
         
-        if not times:
+        # Следующую минуту взводим заранее, чтобы напоминания ушли точно в срок
+        if current_minute + 1 < MINUTES_PER_DAY:
+            await self._dispatch_planned(today, current_minute + 1)
+    
+    async def _dispatch_planned(self, today: date, minute: int, late: bool = False):
+        """Взвести напоминания минуты из плана; при ошибке они возвращаются в план для повтора"""
+        entries = self.reminder_planner.pop_due(minute)
+        try:
+            await self.dispatch_reminders(today, minute, entries, late=late)
+        except Exception:
+            self.reminder_planner.restore(minute, entries)
+            raise
+    
+    def _disarm_chat(self, chat_id: int):
+        """Отменить взведённые напоминания чата (ключи журнала остаются за процессом)"""
+        for key in [key for key in self._armed if key[0] == chat_id]:
+            self._armed.pop(key).cancel()
+            self._disarmed.add(key)
+    
+    def _disarm_foreign(self):
+        """Отменить напоминания чатов, которые процесс больше не арендует (их пошлёт новый владелец)"""
+        if not self.lease:
             return
+        for key in [key for key in self._armed if not self.lease.owns(key[0])]:
+            self._armed.pop(key).cancel()
+    
+    def _fire_reminder(self, entry: ReminderEntry, key: tuple, due: float):
+        """Срабатывание таймера: отправка напоминания"""
+        self._armed.pop(key, None)
+        if self.lease and not self.lease.owns(entry[0]):
+            # Аренда истекла раньше, чем её успели продлить
+            return
+        task = asyncio.create_task(self.send_reminder_safe(*entry, key=key, due=due))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def dispatch_reminders(
+        self,
+        today: date,
+        minute: int,
+        entries: List[ReminderEntry],
+        resume: bool = False,
+        late: bool = False
+    ) -> int:
+        """
+        Взвести напоминания одной минуты на колесе таймеров (кроме уже отправленных по журналу).
+        Каждое срабатывает в начале минуты со сдвигом до REMINDER_SPREAD сек, постоянным для чата;
+        просроченные срабатывают сразу.
+        """
+        if not entries:
+            return 0
         
-        prayer_names_style = chat.get('prayer_names_style', 'standard')
-        lang = chat.get('language', 'ru')
+        target = delivery_target(today, minute)
+        keys = [(entry[0], f"reminder_{entry[1]}", target) for entry in entries]
+        # Ключи взведённых и отменённых при пересчёте таймеров уже заняты этим процессом - только перевзводим
+        owned = {key for key in keys if key in self._armed or key in self._disarmed}
+        claimed = await claim_deliveries(
+            (key for key in keys if key not in owned),
+            include_pending=resume,
+            owner=self.owner
+        )
+        claimed |= owned
         
-        for prayer_key, reminder_minutes in reminders.items():
-            prayer_time_str = times.get(prayer_key)
-            if not prayer_time_str:
+        # Момент минуты по монотонным часам цикла событий
+        moment = datetime.combine(today, time()) + timedelta(minutes=minute)
+        base = self.wheel.time() + (moment - self._local_now()).total_seconds()
+        
+        count = 0
+        for entry, key in zip(entries, keys):
+            if key not in claimed:
                 continue
-            
-            prayer_time = datetime.strptime(prayer_time_str, "%H:%M")
-            prayer_datetime = now.replace(
-                hour=prayer_time.hour,
-                minute=prayer_time.minute,
-                second=0,
-                microsecond=0
-            )
-            
-            # Время напоминания
-            reminder_datetime = prayer_datetime - timedelta(minutes=reminder_minutes)
-            
-            # Проверяем нужно ли отправить напоминание (с точностью до минуты)
-            if (reminder_datetime.hour == now.hour and 
-                reminder_datetime.minute == now.minute):
-                
-                await self.send_reminder_safe(
-                    chat['chat_id'],
-                    prayer_key,
-                    prayer_time_str,
-                    reminder_minutes,
-                    prayer_names_style,
-                    lang
-                )
+            previous = self._armed.get(key)
+            if previous:
+                previous.cancel()
+            self._disarmed.discard(key)
+            due = base + reminder_spread(entry[0])
+            self._armed[key] = self.wheel.call_at(due, self._fire_reminder, entry, key, due)
+            count += 1
+        if late:
+            self.delivery_stats['late'] += count
+        return count
 
     async def send_reminder_safe(
         self,
@@ -163,7 +589,9 @@ class PrayerScheduler:
         prayer_time: str,
         minutes_before: int,
         prayer_names_style: str = "standard",
-        lang: str = "ru"
+        lang: str = "ru",
+        key: Optional[tuple] = None,
+        due: Optional[float] = None
     ):
         """Подготовка текста и отправка напоминания"""
         prayer_names = PRAYER_NAMES_STYLES.get(prayer_names_style, PRAYER_NAMES_STYLES["standard"])
@@ -174,5 +602,5 @@ class PrayerScheduler:
         else:
             text = get_text(lang, "reminder_prayer_soon", min=minutes_before, prayer=prayer_name, time=prayer_time)
         
-        # Используем безопасную отправку
-        await send_safe_message(self.bot, chat_id, text)
\ No newline at end of file
+        # Отправка через общую очередь рассылки
+        await self.broadcaster.submit(chat_id, text, key=key, due=due)
\ No newline at end of file
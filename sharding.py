@@ -0,0 +1,59 @@
+import logging
+import time
+from typing import FrozenSet, Optional, Tuple
+from config import SHARD_COUNT, SHARD_LEASE_TTL
+from database import renew_shard_leases, release_shard_leases, PROCESS_OWNER
+
+logger = logging.getLogger(__name__)
+
+
+def shard_of(chat_id: int, shard_count: int = SHARD_COUNT) -> int:
+    """Номер шарда чата (совпадает с ABS(chat_id) % shard_count в SQL)"""
+    return abs(chat_id) % shard_count
+
+
+class ShardLease:
+    """
+    Шарды чатов, арендованные этим процессом.
+    Аренда хранится в БД и продлевается через renew(); если процесс умер,
+    его шарды после SHARD_LEASE_TTL забирают оставшиеся процессы.
+    """
+
+    def __init__(self, shard_count: int = SHARD_COUNT, owner: Optional[str] = None, ttl: float = SHARD_LEASE_TTL):
+        self.shard_count = shard_count
+        self.owner = owner or PROCESS_OWNER
+        self.ttl = ttl
+        self._shards: FrozenSet[int] = frozenset()
+        # До этого момента (monotonic) аренда точно действует
+        self._valid_until = 0.0
+
+    @property
+    def shards(self) -> FrozenSet[int]:
+        """Свои шарды (пусто, если аренду не удалось продлить вовремя)"""
+        if time.monotonic() >= self._valid_until:
+            return frozenset()
+        return self._shards
+
+    @property
+    def filter(self) -> Tuple[int, FrozenSet[int]]:
+        """Фильтр для запросов к БД: (число шардов, свои шарды)"""
+        return self.shard_count, self.shards
+
+    def owns(self, chat_id: int) -> bool:
+        return shard_of(chat_id, self.shard_count) in self.shards
+
+    async def renew(self) -> FrozenSet[int]:
+        """Продлить аренду (и перераспределить шарды между живыми процессами)"""
+        started = time.monotonic()
+        shards = frozenset(await renew_shard_leases(self.owner, self.shard_count, self.ttl))
+        if shards != self._shards:
+            logger.info(f"Шарды процесса {self.owner}: {sorted(shards)}")
+        self._shards = shards
+        self._valid_until = started + self.ttl
+        return shards
+
+    async def release(self):
+        """Отдать все шарды"""
+        self._shards = frozenset()
+        self._valid_until = 0.0
+        await release_shard_leases(self.owner)
@@ -0,0 +1,44 @@
+import os
+import sys
+
+# config.py требует ADMIN_ID, а пути к данным заданы относительно корня репозитория
+os.environ.setdefault("ADMIN_ID", "1")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """
+    Пустая временная БД. Возвращает run(scenario): запускает корутину-сценарий
+    в новом цикле событий между init_db и close_db.
+    """
+    import database
+    monkeypatch.setattr(database, "DATABASE_PATH", str(tmp_path / "test.db"))
+    monkeypatch.setattr(database, "_db", None)
+    # Блокировки и таймеры привязываются к циклу событий - у каждого теста свои
+    monkeypatch.setattr(database, "_db_lock", asyncio.Lock())
+    monkeypatch.setattr(database, "_write_lock", asyncio.Lock())
+    monkeypatch.setattr(database, "_settings_listeners", [])
+    for buffer in (database.write_buffer, database.delivery_journal):
+        monkeypatch.setattr(buffer, "_flush_lock", asyncio.Lock())
+        monkeypatch.setattr(buffer, "_timer", None)
+        monkeypatch.setattr(buffer, "pending", {})
+    database._settings_cache.clear()
+
+    def run(scenario):
+        async def main():
+            await database.init_db()
+            try:
+                return await scenario()
+            finally:
+                await database.close_db()
+        return asyncio.run(main())
+
+    yield run
+    database._settings_cache.clear()
@@ -0,0 +1,55 @@
+from datetime import date
+
+from astronomy import VALIDATION_TOLERANCE, compute_day, coords_table, validate
+from config import LOCATION_COORDS, PRAYER_KEYS
+from prayer_times import MINUTES_PER_DAY, prayer_manager
+
+SIMFEROPOL = LOCATION_COORDS["Акъмесджит (Симферополь)"]
+
+
+def _deviation(a: int, b: int) -> int:
+    return abs((a - b + MINUTES_PER_DAY // 2) % MINUTES_PER_DAY - MINUTES_PER_DAY // 2)
+
+
+def test_validate_against_csv():
+    assert validate(2026)
+
+
+def test_coords_lookup_matches_csv():
+    for day in (date(2026, 1, 15), date(2026, 6, 21), date(2026, 10, 1)):
+        expected = prayer_manager.get_adjusted_minutes(day)
+        computed = prayer_manager.get_adjusted_minutes(day, coords=SIMFEROPOL)
+        assert expected is not None and computed is not None
+        for key, e, c in zip(PRAYER_KEYS, expected, computed):
+            assert _deviation(e, c) <= VALIDATION_TOLERANCE, key
+
+
+def test_coords_lookup_applies_offsets():
+    day = date(2026, 3, 10)
+    base = prayer_manager.get_adjusted_minutes(day, coords=SIMFEROPOL)
+    shifted = prayer_manager.get_adjusted_minutes(day, 5, {"asr": 2}, coords=SIMFEROPOL)
+    assert [s - b for s, b in zip(shifted, base)] == [5, 5, 5, 7, 5, 5]
+
+
+def test_coords_table_cached_by_rounded_coords():
+    day = date(2026, 5, 1)
+    assert coords_table(day, day, 44.9512, 34.1024) is coords_table(day, day, 44.9498, 34.0996)
+
+
+def test_coords_table_covers_only_requested_days():
+    table = coords_table(date(2026, 12, 20), date(2027, 1, 10), *SIMFEROPOL)
+    assert len(table) == 22
+    assert table.get_row(date(2027, 1, 10)) is not None
+    assert table.get_row(date(2027, 1, 11)) is None
+
+
+def test_high_latitude_summer_uses_night_portion():
+    # В Москве в июне Солнце не опускается на 16°, но фаджр и иша всё равно есть
+    row = compute_day(date(2026, 6, 21), 55.75, 37.62, 3)
+    assert row is not None
+    fajr, sunrise, _, _, maghrib, isha = row
+    assert fajr < sunrise and maghrib < isha
+
+
+def test_no_solution_in_polar_day():
+    assert compute_day(date(2026, 6, 21), 70.0, 25.0, 3) is None
@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+from database import claim_deliveries, delivery_journal, get_db
+
+SHARDS = 2
+# Чат 10 - шард 0, чат 11 - шард 1
+DAILY_10 = (10, "daily", "2026-03-10T05:00")
+DAILY_11 = (11, "daily", "2026-03-10T05:00")
+
+
+async def _set_leases(leases):
+    db = await get_db()
+    await db.execute("DELETE FROM shard_leases")
+    await db.executemany(
+        "INSERT INTO shard_leases (shard_id, owner, expires_at) VALUES (?, ?, ?)",
+        [(shard_id, owner, time.time() + 60) for shard_id, owner in leases.items()]
+    )
+    await db.commit()
+
+
+async def _journal():
+    db = await get_db()
+    async with db.execute("SELECT chat_id, status, owner FROM delivery_journal ORDER BY chat_id") as cursor:
+        return [tuple(row) for row in await cursor.fetchall()]
+
+
+async def _claim(keys, owner, resume=False):
+    return await claim_deliveries(keys, include_pending=resume, owner=owner, shard_count=SHARDS)
+
+
+def test_claim_is_exclusive(temp_db):
+    async def scenario():
+        await _set_leases({0: "a", 1: "a"})
+        first = await _claim([DAILY_10, DAILY_11], "a")
+        # Обычный тик не трогает занятое, даже своё
+        again = await _claim([DAILY_10, DAILY_11], "a")
+        other = await _claim([DAILY_10, DAILY_11], "b")
+        return first, again, other
+
+    first, again, other = temp_db(scenario)
+    assert first == {DAILY_10, DAILY_11}
+    assert again == set() and other == set()
+
+
+def test_resume_takes_over_only_from_owner_without_lease(temp_db):
+    async def scenario():
+        await _set_leases({0: "a", 1: "a"})
+        await _claim([DAILY_10, DAILY_11], "a")
+        # "a" жив и держит оба шарда - его отправки не перехватываются
+        while_alive = await _claim([DAILY_10, DAILY_11], "b", resume=True)
+        # Шард 1 передан "b": недосланное "a" по нему забирается
+        await _set_leases({0: "a", 1: "b"})
+        after_handover = await _claim([DAILY_10, DAILY_11], "b", resume=True)
+        # Аренда "a" истекла совсем
+        await _set_leases({})
+        after_expiry = await _claim([DAILY_10, DAILY_11], "b", resume=True)
+        return while_alive, after_handover, after_expiry, await _journal()
+
+    while_alive, after_handover, after_expiry, journal = temp_db(scenario)
+    assert while_alive == set()
+    assert after_handover == {DAILY_11}
+    assert after_expiry == {DAILY_10}
+    assert journal == [(10, "pending", "b"), (11, "pending", "b")]
+
+
+def test_sent_is_never_reclaimed(temp_db):
+    async def scenario():
+        await _claim([DAILY_10], "a")
+        delivery_journal.mark(DAILY_10, "sent", "a")
+        await delivery_journal.flush()
+        return await _claim([DAILY_10], "b", resume=True), await _journal()
+
+    claimed, journal = temp_db(scenario)
+    assert claimed == set()
+    assert journal == [(10, "sent", "a")]
+
+
+def test_stale_owner_cannot_overwrite_new_claim(temp_db):
+    async def scenario():
+        await _claim([DAILY_11], "a")
+        await _set_leases({1: "b"})
+        await _claim([DAILY_11], "b", resume=True)
+        # "a" потерял шард, но дослал итог из своей очереди
+        delivery_journal.mark(DAILY_11, "failed", "a")
+        await delivery_journal.flush()
+        stale = await _journal()
+        delivery_journal.mark(DAILY_11, "sent", "b")
+        await delivery_journal.flush()
+        return stale, await _journal()
+
+    stale, final = temp_db(scenario)
+    assert stale == [(11, "pending", "b")]
+    assert final == [(11, "sent", "b")]
+
+
+def test_concurrent_claims_have_one_winner(temp_db):
+    async def scenario():
+        return await asyncio.gather(*(_claim([DAILY_10], owner) for owner in ("a", "b", "c")))
+
+    results = temp_db(scenario)
+    assert sorted(len(claimed) for claimed in results) == [0, 0, 1]
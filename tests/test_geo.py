@@ -0,0 +1,15 @@
+from geo import city_index, in_coords_region
+
+
+def test_nearest_city():
+    nearest = city_index.nearest(44.96, 34.11)
+    assert nearest.name == "Акъмесджит (Симферополь)"
+    assert nearest.distance_km < 2
+
+
+def test_coords_region_excludes_other_timezones():
+    # Черноморское побережье Крыма - расчёт по координатам допустим
+    assert in_coords_region(44.40, 33.90)
+    # Киев и Берлин - другой пояс и другие поправки
+    assert not in_coords_region(50.45, 30.52)
+    assert not in_coords_region(52.52, 13.40)
@@ -0,0 +1,145 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import scheduler
+from database import flush_pending_writes, save_chat_settings
+from prayer_times import format_minutes, prayer_manager
+
+NOON = datetime(2026, 3, 10, 12, 0)
+
+
+class FakeBroadcaster:
+    """Вместо рассылки запоминает ключи журнала поставленных сообщений"""
+
+    owner = "test"
+
+    def __init__(self):
+        self.sent = []
+
+    async def submit(self, chat_id, text, disable_notification=False, key=None, due=None):
+        self.sent.append(key)
+        return True
+
+
+def _make_scheduler(clock):
+    broadcaster = FakeBroadcaster()
+    sch = scheduler.PrayerScheduler(None, broadcaster)
+    sch._local_now = lambda: clock[0]
+    return sch, broadcaster
+
+
+async def _reminder_chat(chat_id: int, fire: datetime):
+    """Чат с напоминанием за 5 минут до иши, срабатывающим в момент fire"""
+    isha = prayer_manager.get_adjusted_minutes(fire.date())[5]
+    minute = fire.hour * 60 + fire.minute
+    await save_chat_settings(chat_id, reminders={"isha": 5}, time_offset=minute + 5 - isha)
+
+
+def test_failed_tick_is_retried(temp_db, monkeypatch):
+    real_claim = scheduler.claim_deliveries
+    failures = [2]
+
+    async def flaky_claim(*args, **kwargs):
+        if failures[0]:
+            failures[0] -= 1
+            raise RuntimeError("database is locked")
+        return await real_claim(*args, **kwargs)
+
+    monkeypatch.setattr(scheduler, "claim_deliveries", flaky_claim)
+
+    async def scenario():
+        await save_chat_settings(1, daily_schedule_time=format_minutes(NOON.hour * 60))
+        await _reminder_chat(2, NOON)
+        await flush_pending_writes()
+        clock = [NOON]
+        sch, broadcaster = _make_scheduler(clock)
+
+        # Обе проверки 12:00 падают на записи в журнал
+        with pytest.raises(RuntimeError):
+            await sch.check_daily_schedules()
+        with pytest.raises(RuntimeError):
+            await sch.check_reminders()
+        assert broadcaster.sent == []
+
+        # Следующий тик досылает 12:00, а не считает её обработанной
+        clock[0] = NOON + timedelta(minutes=1)
+        await sch.check_daily_schedules()
+        await sch.check_reminders()
+        await asyncio.sleep(0.3)
+        sch.wheel.stop()
+        return broadcaster.sent, sch.delivery_stats
+
+    sent, stats = temp_db(scenario)
+    assert sorted(sent) == [(1, "daily", "2026-03-10T12:00"), (2, "reminder_isha", "2026-03-10T12:00")]
+    assert stats["late"] == 2
+
+
+def test_changed_reminder_is_replanned_without_dead_timers(temp_db):
+    async def scenario():
+        fire = NOON + timedelta(minutes=6)
+        await _reminder_chat(2, fire)
+        await flush_pending_writes()
+        clock = [NOON + timedelta(minutes=5)]
+        sch, broadcaster = _make_scheduler(clock)
+
+        # За минуту до срока напоминание взведено на колесе
+        await sch.check_reminders()
+        old_key = (2, "reminder_isha", "2026-03-10T12:06")
+        old_handle = sch._armed[old_key]
+        assert list(sch._armed) == [old_key]
+
+        # Напоминание за 4 минуты вместо 5 - чат пересчитывается, старый таймер снят
+        await save_chat_settings(2, reminders={"isha": 4})
+        assert 2 in sch.reminder_planner.dirty_chats
+        clock[0] = fire
+        await sch.check_reminders()
+        new_key = (2, "reminder_isha", "2026-03-10T12:07")
+        assert old_handle.cancelled
+        assert list(sch._armed) == [new_key]
+
+        # Срабатывание таймера (колесо идёт по настоящим часам, поэтому вызываем сами)
+        handle = sch._armed[new_key]
+        handle.callback(*handle.args)
+        await asyncio.sleep(0.05)
+        sch.wheel.stop()
+        return broadcaster.sent, sch._armed
+
+    sent, armed = temp_db(scenario)
+    assert sent == [(2, "reminder_isha", "2026-03-10T12:07")]
+    assert armed == {}
+
+
+def test_planner_replans_only_dirty_chats():
+    day = NOON.date()
+    isha = prayer_manager.get_adjusted_minutes(day)[5]
+    planner = scheduler.ReminderPlanner()
+    chats = [
+        {"chat_id": 1, "reminders": {"isha": 10}},
+        {"chat_id": 2, "reminders": {"isha": 5}},
+        {"chat_id": 3, "reminders": {"isha": 5}, "is_active": 0},
+    ]
+    planner.rebuild(day, chats)
+    assert len(planner) == 2
+    assert [entry[0] for entry in planner.buckets[isha - 10]] == [1]
+
+    # Вид меню не влияет на напоминания, смещение - влияет
+    planner.on_settings_changed(1, ["show_hijri"])
+    planner.on_settings_changed(2, ["time_offset"])
+    assert planner.dirty_chats == {2}
+
+    planner.remove_chat(2)
+    planner.add_chat({"chat_id": 2, "reminders": {"isha": 5}, "time_offset": 3})
+    assert isha - 5 not in planner.buckets
+    assert [entry[0] for entry in planner.buckets[isha - 2]] == [2]
+
+    # Напоминания раньше from_minute уже не планируются
+    planner.remove_chat(1)
+    planner.add_chat(chats[0], from_minute=isha - 9)
+    assert len(planner) == 1
+
+    due = planner.pop_due(isha - 2)
+    assert len(due) == 1 and len(planner) == 0
+    planner.restore(isha - 2, due)
+    assert planner.pop_due(isha - 2) == due
@@ -0,0 +1,24 @@
+from collections import Counter
+
+from database import renew_shard_leases
+
+
+def test_shards_balanced_across_workers(temp_db):
+    owners = [f"worker-{i:02d}" for i in range(12)]
+
+    async def scenario():
+        # Процессы запускаются по одному и продлевают аренду по кругу
+        held = {}
+        for started in range(1, len(owners) + 1):
+            for owner in owners[:started]:
+                held[owner] = await renew_shard_leases(owner, 16, 30)
+        for _ in range(3):
+            for owner in owners:
+                held[owner] = await renew_shard_leases(owner, 16, 30)
+        return held
+
+    held = temp_db(scenario)
+    counts = Counter({owner: len(shards) for owner, shards in held.items()})
+    assert sorted(shard for shards in held.values() for shard in shards) == list(range(16))
+    # 16 шардов на 12 процессов: никто не простаивает
+    assert sorted(counts.values()) == [1] * 8 + [2] * 4
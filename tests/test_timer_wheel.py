@@ -0,0 +1,81 @@
+import asyncio
+
+from timer_wheel import TimerWheel
+
+
+def _run(scenario):
+    return asyncio.run(scenario())
+
+
+def test_timers_fire_in_order_near_their_time():
+    async def scenario():
+        wheel = TimerWheel(tick=0.01, slots=8, levels=2)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        fired = []
+        for delay in (0.15, 0.02, 0.08):
+            wheel.call_at(start + delay, lambda d=delay: fired.append((d, loop.time() - start)))
+        await asyncio.sleep(0.3)
+        return fired, len(wheel)
+
+    fired, left = _run(scenario)
+    assert [delay for delay, _ in fired] == [0.02, 0.08, 0.15]
+    for delay, actual in fired:
+        # Не раньше срока и не позже, чем через пару тиков
+        assert delay - 0.001 <= actual <= delay + 0.05
+    assert left == 0
+
+
+def test_cancelled_timer_does_not_fire():
+    async def scenario():
+        wheel = TimerWheel(tick=0.01, slots=8, levels=2)
+        fired = []
+        keep = wheel.call_later(0.05, fired.append, "keep")
+        drop = wheel.call_later(0.05, fired.append, "drop")
+        drop.cancel()
+        await asyncio.sleep(0.15)
+        return fired, keep.cancelled
+
+    fired, cancelled = _run(scenario)
+    assert fired == ["keep"] and not cancelled
+
+
+def test_far_timers_cascade_from_upper_levels_and_overflow():
+    async def scenario():
+        # Уровень 0 - 4 тика, уровень 1 - 16 тиков, дальше - overflow
+        wheel = TimerWheel(tick=0.01, slots=4, levels=2)
+        fired = []
+        for delay in (0.03, 0.12, 0.35):
+            wheel.call_later(delay, fired.append, delay)
+        overflow = len(wheel.overflow)
+        await asyncio.sleep(0.5)
+        return fired, overflow, len(wheel)
+
+    fired, overflow, left = _run(scenario)
+    assert overflow == 1
+    assert fired == [0.03, 0.12, 0.35]
+    assert left == 0
+
+
+def test_overdue_timer_fires_on_next_tick():
+    async def scenario():
+        wheel = TimerWheel(tick=0.01)
+        fired = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        wheel.call_at(loop.time() - 5, fired.set)
+        await asyncio.wait_for(fired.wait(), 0.1)
+
+    _run(scenario)
+
+
+def test_stop_cancels_everything():
+    async def scenario():
+        wheel = TimerWheel(tick=0.01, slots=4, levels=2)
+        fired = []
+        for delay in (0.02, 0.1, 0.5):
+            wheel.call_later(delay, fired.append, delay)
+        wheel.stop()
+        await asyncio.sleep(0.15)
+        return fired, len(wheel)
+
+    assert _run(scenario) == ([], 0)
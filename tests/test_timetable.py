@@ -0,0 +1,40 @@
+import os
+import shutil
+from datetime import date
+
+from prayer_times import Timetable, compiled_timetable_is_fresh, read_timetable_rows, sources_digest
+
+CSV = "data/prayer_times.csv"
+
+
+def _compile(tmp_path):
+    csv_path = str(tmp_path / "prayer_times.csv")
+    bin_path = str(tmp_path / "prayer_times.bin")
+    shutil.copy(CSV, csv_path)
+    rows, _ = read_timetable_rows([csv_path])
+    Timetable.from_rows(rows).to_file(bin_path, sources_digest([csv_path]))
+    return csv_path, bin_path, rows
+
+
+def test_compiled_table_matches_csv(tmp_path):
+    csv_path, bin_path, rows = _compile(tmp_path)
+    assert compiled_timetable_is_fresh(bin_path, [csv_path])
+    compiled = Timetable.from_file(bin_path)
+    day = min(rows)
+    assert compiled.get_row(day) == tuple(rows[day])
+    assert compiled.get_row(date(1990, 1, 1)) is None
+
+
+def test_changed_csv_with_older_mtime_is_stale(tmp_path):
+    csv_path, bin_path, _ = _compile(tmp_path)
+    with open(csv_path, "a", encoding="utf-8") as f:
+        f.write("\n")
+    # CSV восстановлен из копии: содержимое другое, а время изменения старше .bin
+    os.utime(csv_path, (0, 0))
+    assert not compiled_timetable_is_fresh(bin_path, [csv_path])
+
+
+def test_touched_csv_with_same_content_stays_fresh(tmp_path):
+    csv_path, bin_path, _ = _compile(tmp_path)
+    os.utime(csv_path, None)
+    assert compiled_timetable_is_fresh(bin_path, [csv_path])
@@ -0,0 +1,131 @@
+import asyncio
+import random
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import Message
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from webhook import SECRET_HEADER, UpdatePipeline, create_app
+
+TOKEN = "123456:TEST"
+SECRET = "s3cret"
+
+
+def _update(update_id: int, chat_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "user"},
+            "text": text,
+        },
+    }
+
+
+async def _fake_telegram(sent: list) -> TestServer:
+    """Локальный Bot API: запоминает sendMessage и отвечает как Telegram"""
+
+    async def method(request: web.Request) -> web.Response:
+        data = dict(await request.post())
+        chat_id = int(data["chat_id"])
+        sent.append((chat_id, data["text"]))
+        return web.json_response({"ok": True, "result": {
+            "message_id": len(sent),
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "text": data["text"],
+        }})
+
+    app = web.Application()
+    app.router.add_post(f"/bot{TOKEN}/{{method}}", method)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+def _echo_dispatcher(handled: list) -> Dispatcher:
+    router = Router()
+
+    @router.message()
+    async def echo(message: Message):
+        # Разное время обработки: порядок внутри чата держит конвейер, а не везение
+        await asyncio.sleep(random.uniform(0, 0.02))
+        handled.append((message.chat.id, message.text))
+        await message.answer(f"re: {message.text}")
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+async def _webhook(pipeline: UpdatePipeline) -> TestClient:
+    client = TestClient(TestServer(create_app(pipeline, "/webhook", SECRET)))
+    await client.start_server()
+    return client
+
+
+def test_updates_flow_to_fake_telegram_in_per_chat_order():
+    async def scenario():
+        sent, handled = [], []
+        telegram = await _fake_telegram(sent)
+        bot = Bot(TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(str(telegram.make_url("")).rstrip("/"))))
+        pipeline = UpdatePipeline(_echo_dispatcher(handled), bot, workers=4, queue_size=100)
+        pipeline.start()
+        client = await _webhook(pipeline)
+        try:
+            statuses = []
+            update_id = 0
+            for i in range(10):
+                for chat_id in (101, 102, 103):
+                    update_id += 1
+                    response = await client.post(
+                        "/webhook", json=_update(update_id, chat_id, f"{chat_id}-{i}"),
+                        headers={SECRET_HEADER: SECRET}
+                    )
+                    statuses.append(response.status)
+            await pipeline.stop()
+        finally:
+            await client.close()
+            await telegram.close()
+            await bot.session.close()
+        return statuses, handled, sent, pipeline
+
+    statuses, handled, sent, pipeline = asyncio.run(scenario())
+    assert set(statuses) == {200}
+    assert pipeline.processed == 30 and pipeline.failed == 0
+    for chat_id in (101, 102, 103):
+        expected = [f"{chat_id}-{i}" for i in range(10)]
+        assert [text for cid, text in handled if cid == chat_id] == expected
+        assert [text for cid, text in sent if cid == chat_id] == [f"re: {t}" for t in expected]
+
+
+def test_rejects_bad_secret_bad_body_and_overflow():
+    async def scenario():
+        bot = Bot(TOKEN)
+        # Воркеры не запущены - очередь только заполняется
+        pipeline = UpdatePipeline(Dispatcher(), bot, workers=1, queue_size=2)
+        client = await _webhook(pipeline)
+        try:
+            headers = {SECRET_HEADER: SECRET}
+            wrong_secret = await client.post("/webhook", json=_update(1, 1, "x"), headers={SECRET_HEADER: "no"})
+            bad_body = await client.post("/webhook", data="not json", headers=headers)
+            accepted = [
+                (await client.post("/webhook", json=_update(i, 1, "x"), headers=headers)).status
+                for i in range(1, 4)
+            ]
+        finally:
+            await client.close()
+            await bot.session.close()
+        return wrong_secret.status, bad_body.status, accepted, pipeline
+
+    wrong_secret, bad_body, accepted, pipeline = asyncio.run(scenario())
+    assert wrong_secret == 401
+    assert bad_body == 400
+    # Переполнение - 503, Telegram повторит доставку
+    assert accepted == [200, 200, 503]
+    assert (pipeline.accepted, pipeline.rejected) == (2, 1)
@@ -0,0 +1,87 @@
+import asyncio
+
+import database
+from database import (
+    flush_pending_writes, get_chat_settings, get_db, queue_chat_active_status,
+    queue_chat_settings, save_chat_settings, write_buffer
+)
+
+
+async def _stored(chat_id, column):
+    db = await get_db()
+    async with db.execute(f"SELECT {column} FROM chat_settings WHERE chat_id = ?", (chat_id,)) as cursor:
+        return (await cursor.fetchone())[0]
+
+
+def test_pending_values_are_visible_before_flush(temp_db):
+    async def scenario():
+        await save_chat_settings(1)
+        queue_chat_settings(1, show_hijri=0, hijri_style="arabic")
+        queue_chat_active_status(1, False)
+        seen = await get_chat_settings(1)
+        stored_before = await _stored(1, "show_hijri")
+        await flush_pending_writes()
+        return seen, stored_before, await _stored(1, "show_hijri"), await _stored(1, "is_active")
+
+    seen, before, after, active = temp_db(scenario)
+    assert (seen["show_hijri"], seen["hijri_style"], seen["is_active"]) == (0, "arabic", 0)
+    assert before == 1
+    assert (after, active) == (0, 0)
+
+
+def test_direct_write_overrides_pending_field(temp_db):
+    async def scenario():
+        await save_chat_settings(1)
+        queue_chat_settings(1, show_hijri=0, show_holidays=0)
+        await save_chat_settings(1, show_hijri=1)
+        await flush_pending_writes()
+        return await _stored(1, "show_hijri"), await _stored(1, "show_holidays")
+
+    # Отложенное значение поля не перезаписывает более позднюю прямую запись, остальные поля пишутся
+    assert temp_db(scenario) == (1, 0)
+
+
+def test_direct_write_overrides_field_in_inflight_batch(temp_db):
+    async def scenario():
+        await save_chat_settings(1)
+        queue_chat_settings(1, show_hijri=0, show_holidays=0)
+
+        # Пачка уже забрана в запись, но ждёт блокировку
+        async with database._write_lock:
+            flush = asyncio.create_task(write_buffer.flush())
+            await asyncio.sleep(0.01)
+            inflight = dict(write_buffer.inflight.get(1, {}))
+            direct = asyncio.create_task(save_chat_settings(1, show_hijri=1))
+            await asyncio.sleep(0.01)
+            after_discard = dict(write_buffer.inflight.get(1, {}))
+        await asyncio.gather(flush, direct)
+        return inflight, after_discard, await _stored(1, "show_hijri"), await _stored(1, "show_holidays")
+
+    inflight, after_discard, show_hijri, show_holidays = temp_db(scenario)
+    assert inflight == {"show_hijri": 0, "show_holidays": 0}
+    assert after_discard == {"show_holidays": 0}
+    assert (show_hijri, show_holidays) == (1, 0)
+
+
+def test_failed_flush_keeps_batch_and_newer_values_win(temp_db, monkeypatch):
+    real_save = database.save_many_chat_settings
+    calls = []
+
+    async def failing_once(updates, *args, **kwargs):
+        calls.append(dict(updates))
+        if len(calls) == 1:
+            queue_chat_settings(1, show_hijri=1)
+            raise RuntimeError("database is locked")
+        return await real_save(updates, *args, **kwargs)
+
+    monkeypatch.setattr(database, "save_many_chat_settings", failing_once)
+
+    async def scenario():
+        await save_chat_settings(1)
+        queue_chat_settings(1, show_hijri=0, show_holidays=0)
+        await write_buffer.flush()
+        await write_buffer.flush()
+        return await _stored(1, "show_hijri"), await _stored(1, "show_holidays")
+
+    assert temp_db(scenario) == (1, 0)
+    assert len(calls) == 2
@@ -0,0 +1,178 @@
+"""
+Иерархическое колесо таймеров поверх asyncio.
+
+Таймеры раскладываются по слотам нескольких уровней: уровень 0 - по одному
+тику, каждый следующий - в TIMER_WHEEL_SLOTS раз крупнее. Добавление и отмена
+занимают O(1), а цикл событий будится через loop.call_at только тогда, когда
+есть что запускать или пора переложить таймеры с верхнего уровня на нижний.
+Время - монотонное время цикла (loop.time()), переводы часов на него не влияют.
+"""
+import asyncio
+import logging
+import math
+from typing import Callable, List, Optional
+from config import TIMER_WHEEL_TICK, TIMER_WHEEL_SLOTS, TIMER_WHEEL_LEVELS
+
+logger = logging.getLogger(__name__)
+
+
+class TimerHandle:
+    """Запланированный вызов; cancel() отменяет его"""
+
+    __slots__ = ("when", "tick", "callback", "args", "cancelled")
+
+    def __init__(self, when: float, tick: int, callback: Callable, args: tuple):
+        self.when = when
+        self.tick = tick
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    """Колесо таймеров с интерфейсом, как у loop.call_at / loop.call_later"""
+
+    def __init__(
+        self,
+        tick: float = TIMER_WHEEL_TICK,
+        slots: int = TIMER_WHEEL_SLOTS,
+        levels: int = TIMER_WHEEL_LEVELS
+    ):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.wheels: List[List[List[TimerHandle]]] = [[[] for _ in range(slots)] for _ in range(levels)]
+        # Таймеры дальше, чем покрывает верхний уровень
+        self.overflow: List[TimerHandle] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._origin = 0.0
+        # Последний обработанный тик
+        self._current = 0
+        self._count = 0
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self._wakeup_tick = 0
+        self.fired = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _now_tick(self) -> int:
+        return math.floor((self._loop.time() - self._origin) / self.tick)
+
+    def time(self) -> float:
+        """Текущее время цикла событий"""
+        return (self._loop or asyncio.get_running_loop()).time()
+
+    def call_later(self, delay: float, callback: Callable, *args) -> TimerHandle:
+        """Вызвать callback(*args) через delay секунд"""
+        return self.call_at(self.time() + delay, callback, *args)
+
+    def call_at(self, when: float, callback: Callable, *args) -> TimerHandle:
+        """Вызвать callback(*args) в момент when (по loop.time()), с точностью до тика"""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._origin = self._loop.time()
+        if self._count == 0:
+            # Колесо пустое - можно сразу перескочить к текущему тику
+            self._current = max(self._current, self._now_tick())
+
+        # Просроченное сработает на ближайшем тике
+        tick = max(math.ceil((when - self._origin) / self.tick), self._current + 1)
+        handle = TimerHandle(when, tick, callback, args)
+        self._insert(handle)
+        self._count += 1
+        self._schedule_wakeup()
+        return handle
+
+    def _insert(self, handle: TimerHandle):
+        """Положить таймер на самый нижний уровень, в оборот которого он попадает"""
+        span = self.slots
+        unit = 1
+        for level in range(self.levels):
+            if handle.tick // span == self._current // span:
+                self.wheels[level][(handle.tick // unit) % self.slots].append(handle)
+                return
+            unit = span
+            span *= self.slots
+        self.overflow.append(handle)
+
+    def _cascade(self):
+        """На границе оборота переложить таймеры верхних уровней ниже"""
+        tick = self._current
+        unit = self.slots ** self.levels
+        if tick % unit == 0 and self.overflow:
+            pending, self.overflow = self.overflow, []
+            for handle in pending:
+                self._insert(handle)
+        # Сверху вниз: переложенное с уровня i может сразу уйти ещё ниже
+        for level in range(self.levels - 1, 0, -1):
+            unit = self.slots ** level
+            if tick % unit:
+                continue
+            slot = self.wheels[level][(tick // unit) % self.slots]
+            if slot:
+                pending = slot[:]
+                slot.clear()
+                for handle in pending:
+                    self._insert(handle)
+
+    def _advance(self):
+        """Обработать все тики до текущего момента (догоняя, если цикл был занят)"""
+        self._wakeup = None
+        target = self._now_tick()
+        while self._current < target and self._count:
+            self._current += 1
+            self._cascade()
+            slot = self.wheels[0][self._current % self.slots]
+            if not slot:
+                continue
+            due, slot[:] = slot[:], []
+            for handle in due:
+                self._count -= 1
+                if handle.cancelled:
+                    continue
+                self.fired += 1
+                try:
+                    handle.callback(*handle.args)
+                except Exception:
+                    logger.exception("Ошибка в таймере")
+        if not self._count:
+            self._current = max(self._current, target)
+        self._schedule_wakeup()
+
+    def _schedule_wakeup(self):
+        """Разбудить цикл на ближайшем непустом слоте или границе оборота"""
+        if not self._count:
+            if self._wakeup:
+                self._wakeup.cancel()
+                self._wakeup = None
+            return
+
+        current = self._current
+        boundary = current - current % self.slots + self.slots
+        wake_tick = boundary
+        for tick in range(current + 1, boundary):
+            if self.wheels[0][tick % self.slots]:
+                wake_tick = tick
+                break
+
+        if self._wakeup:
+            if self._wakeup_tick <= wake_tick:
+                return
+            self._wakeup.cancel()
+        self._wakeup_tick = wake_tick
+        self._wakeup = self._loop.call_at(self._origin + wake_tick * self.tick, self._advance)
+
+    def stop(self):
+        """Отменить все таймеры"""
+        if self._wakeup:
+            self._wakeup.cancel()
+            self._wakeup = None
+        for wheel in self.wheels:
+            for slot in wheel:
+                slot.clear()
+        self.overflow.clear()
+        self._count = 0
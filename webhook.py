@@ -0,0 +1,166 @@
+import asyncio
+import logging
+from typing import List, Optional
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiogram.types.update import UpdateTypeLookupError
+from pydantic import ValidationError
+
+from config import (
+    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT,
+    UPDATE_QUEUE_SIZE, UPDATE_WORKERS
+)
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def update_chat_id(update: Update) -> Optional[int]:
+    """Чат (или пользователь), к которому относится обновление"""
+    try:
+        event = update.event
+    except UpdateTypeLookupError:
+        return None
+    chat = getattr(event, "chat", None)
+    if chat is not None:
+        return chat.id
+    message = getattr(event, "message", None)
+    if message is not None and getattr(message, "chat", None) is not None:
+        return message.chat.id
+    user = getattr(event, "from_user", None) or getattr(event, "user", None)
+    if user is not None:
+        return user.id
+    return None
+
+
+class UpdatePipeline:
+    """
+    Очередь входящих обновлений и пул воркеров.
+    Обновления одного чата всегда попадают к одному воркеру и обрабатываются
+    по порядку, разные чаты обрабатываются параллельно.
+    """
+
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        workers: int = UPDATE_WORKERS,
+        queue_size: int = UPDATE_QUEUE_SIZE
+    ):
+        self.dp = dp
+        self.bot = bot
+        self.workers_count = workers
+        # Своя очередь на воркер: порядок внутри чата сохраняется без блокировок
+        per_worker = max(1, queue_size // workers)
+        self.queues: List[asyncio.Queue] = [asyncio.Queue(maxsize=per_worker) for _ in range(workers)]
+        self._workers: List[asyncio.Task] = []
+        self.accepted = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+
+    def start(self):
+        """Запуск воркеров"""
+        for queue in self.queues:
+            self._workers.append(asyncio.create_task(self._worker(queue)))
+        logger.info(f"Обработка обновлений запущена: {self.workers_count} воркеров")
+
+    async def stop(self, timeout: Optional[float] = 10):
+        """Дообработать очередь (не дольше timeout) и остановить воркеров"""
+        try:
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in self.queues)), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Обработка остановлена, в очереди осталось {self.pending} обновлений")
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+        logger.info(
+            f"Обработка остановлена: принято {self.accepted}, отклонено {self.rejected}, "
+            f"обработано {self.processed}, ошибок {self.failed}"
+        )
+
+    @property
+    def pending(self) -> int:
+        return sum(q.qsize() for q in self.queues)
+
+    def submit(self, update: Update) -> bool:
+        """Поставить обновление в очередь; False, если очередь переполнена"""
+        chat_id = update_chat_id(update)
+        key = chat_id if chat_id is not None else update.update_id
+        try:
+            self.queues[key % self.workers_count].put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        return True
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            update = await queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Ошибка обработки обновления {update.update_id}: {e}")
+            finally:
+                queue.task_done()
+
+
+def create_app(pipeline: UpdatePipeline, path: str = WEBHOOK_PATH, secret: Optional[str] = WEBHOOK_SECRET) -> web.Application:
+    """aiohttp-приложение, принимающее обновления от Telegram"""
+
+    async def handle_update(request: web.Request) -> web.Response:
+        if secret and request.headers.get(SECRET_HEADER) != secret:
+            return web.Response(status=401)
+        try:
+            data = await request.json()
+            update = Update.model_validate(data, context={"bot": pipeline.bot})
+        except (ValueError, ValidationError):
+            return web.Response(status=400)
+        # Переполнение: Telegram повторит доставку позже
+        if not pipeline.submit(update):
+            return web.Response(status=503)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    return app
+
+
+async def run_webhook(
+    bot: Bot,
+    dp: Dispatcher,
+    host: str = WEBHOOK_HOST,
+    port: int = WEBHOOK_PORT
+):
+    """Запуск бота в режиме webhook (работает до отмены)"""
+    pipeline = UpdatePipeline(dp, bot)
+    pipeline.start()
+
+    app = create_app(pipeline)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+
+    await dp.emit_startup(bot=bot, **dp.workflow_data)
+    await bot.set_webhook(
+        url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types(),
+        drop_pending_updates=True
+    )
+    logger.info(f"Webhook слушает {host}:{port}{WEBHOOK_PATH}")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        # Сначала перестаём принимать обновления, потом дообрабатываем очередь
+        await runner.cleanup()
+        await pipeline.stop()
+        await dp.emit_shutdown(bot=bot, **dp.workflow_data)